@@ -0,0 +1,346 @@
+"""Local stand-ins for Discord, EventBrite and Pretalx used by the benchmarks.
+
+The HTTP fakes are ``httpx.MockTransport`` handlers, plugged into the real
+clients, so paging, retries and rate limiting run the production code. The
+Discord fakes implement just the parts of discord.py the cogs touch.
+"""
+import asyncio
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Optional
+
+import discord
+import httpx
+
+from benchmarks.index_memory import DOMAINS, FIRST_NAMES, LAST_NAMES
+from pybr2022.auth.cog import AuthenticationCog
+from pybr2022.auth.eventbrite import EventBrite
+from pybr2022.auth.index import AttendeesIndex
+from pybr2022.ratelimit import RetryPolicy, TokenBucket
+from pybr2022.talks.pretalx import Pretalx
+
+GUILD_ID = 1
+ATTENDEE_ROLE_NAME = "participante"
+
+
+def attendee_email(number: int) -> str:
+    first_name = FIRST_NAMES[number % len(FIRST_NAMES)]
+    last_name = LAST_NAMES[number % len(LAST_NAMES)]
+    return f"{first_name}.{last_name}{number}@{DOMAINS[number % len(DOMAINS)]}".lower()
+
+
+def eventbrite_attendee(number: int) -> dict:
+    return {
+        "id": str(2_000_000_000 + number),
+        "order_id": str(1_000_000_000 + number),
+        "status": "Attending",
+        "profile": {
+            "first_name": FIRST_NAMES[number % len(FIRST_NAMES)],
+            "last_name": LAST_NAMES[number % len(LAST_NAMES)],
+            "email": attendee_email(number),
+        },
+    }
+
+
+@dataclass
+class ServerStats:
+    requests: int = 0
+    throttled: int = 0
+    not_modified: int = 0
+
+
+@dataclass
+class FakeUpstream:
+    """Latency and 429s shared by the fake HTTP servers."""
+
+    latency: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 0.0
+    seed: int = 0
+    stats: ServerStats = field(default_factory=ServerStats)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    async def _respond(self, request: httpx.Request) -> Optional[httpx.Response]:
+        self.stats.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._rng.random() < self.throttle_rate:
+            self.stats.throttled += 1
+            return httpx.Response(
+                429, headers={"Retry-After": str(self.retry_after)}, json={}
+            )
+        return None
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        raise NotImplementedError
+
+
+@dataclass
+class FakeEventBrite(FakeUpstream):
+    attendees: int = 100_000
+    page_size: int = 500
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        throttled = await self._respond(request)
+        if throttled:
+            return throttled
+
+        continuation = request.url.params.get("continuation")
+        start = int(continuation) if continuation else 0
+        end = min(start + self.page_size, self.attendees)
+        has_more_items = end < self.attendees
+        pagination = {
+            "object_count": self.attendees,
+            "page_number": start // self.page_size + 1,
+            "page_count": -(-self.attendees // self.page_size),
+            "page_size": self.page_size,
+            "has_more_items": has_more_items,
+        }
+        if has_more_items:
+            pagination["continuation"] = str(end)
+        return httpx.Response(
+            200,
+            json={
+                "pagination": pagination,
+                "attendees": [eventbrite_attendee(n) for n in range(start, end)],
+            },
+        )
+
+
+@dataclass
+class FakePretalx(FakeUpstream):
+    talks: int = 300
+    page_size: int = 100
+
+    def _talk(self, number: int) -> dict:
+        start = datetime(2022, 10, 31, 9, tzinfo=timezone(timedelta(hours=-4)))
+        start += timedelta(minutes=30 * (number // 4))
+        return {
+            "code": f"TALK{number}",
+            "title": f"Palestra {number}",
+            "speakers": [{"name": f"Pessoa {number}"}],
+            "slot": {
+                "room": {
+                    "pt-BR": ["Aruanã", "Tucunaré", "Jaraqui", "Keynote"][number % 4]
+                },
+                "start": start.isoformat(),
+                "end": (start + timedelta(minutes=30)).isoformat(),
+            },
+            "submission_type": {"pt-BR": "Palestra"},
+            "description": f"Link: https://youtube.com/watch?v={number}",
+        }
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        throttled = await self._respond(request)
+        if throttled:
+            return throttled
+
+        etag = '"schedule-v1"'
+        if request.headers.get("if-none-match") == etag:
+            self.stats.not_modified += 1
+            return httpx.Response(304, headers={"ETag": etag})
+
+        offset = int(request.url.params.get("offset", 0))
+        end = min(offset + self.page_size, self.talks)
+        next_url = None
+        if end < self.talks:
+            next_url = str(request.url.copy_merge_params({"offset": end}))
+        return httpx.Response(
+            200,
+            headers={"ETag": etag},
+            json={
+                "count": self.talks,
+                "next": next_url,
+                "results": [self._talk(n) for n in range(offset, end)],
+            },
+        )
+
+
+def fake_eventbrite(server: FakeEventBrite, rate: float = 1000.0) -> EventBrite:
+    eventbrite = EventBrite(
+        "event-id",
+        "token",
+        rate_limiter=TokenBucket(rate, int(rate), max_concurrency=5),
+        retry_policy=RetryPolicy(max_attempts=10, base_delay=0.01, max_delay=0.1),
+    )
+    eventbrite._client = server.client()
+    return eventbrite
+
+
+def fake_pretalx(server: FakePretalx, rate: float = 1000.0) -> Pretalx:
+    pretalx = Pretalx(
+        "python-brasil-2022",
+        "token",
+        rate_limiter=TokenBucket(rate, int(rate), max_concurrency=5),
+        retry_policy=RetryPolicy(max_attempts=10, base_delay=0.01, max_delay=0.1),
+    )
+    pretalx._client = server.client()
+    return pretalx
+
+
+_ids = itertools.count(1000)
+
+
+class FakeUser:
+    def __init__(self, user_id: Optional[int] = None, latency: float = 0.0):
+        self.id = user_id or next(_ids)
+        self.bot = False
+        self.latency = latency
+        self.replies: list[tuple[float, str]] = []
+
+    async def send(self, content: str = "", **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.replies.append((time.perf_counter(), content))
+
+    def __repr__(self) -> str:
+        return f"<FakeUser id={self.id}>"
+
+    def __str__(self) -> str:
+        return f"user{self.id}"
+
+
+class FakeMember(FakeUser):
+    def __init__(self, user_id: int, everyone: "FakeRole", latency: float = 0.0):
+        super().__init__(user_id, latency)
+        self.roles = [everyone]
+        self.display_name = f"Pessoa {user_id}"
+        self.joined_at = datetime.now(timezone.utc)
+        self.role_granted_at: Optional[float] = None
+
+    async def add_roles(self, *roles):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.roles.extend(roles)
+        self.role_granted_at = time.perf_counter()
+
+
+@dataclass(eq=False)
+class FakeRole:
+    id: int
+    name: str
+
+
+@dataclass(eq=False)
+class FakeChannel:
+    id: int
+    name: str
+    latency: float = 0.0
+    messages: list = field(default_factory=list)
+
+    async def send(self, content: str = "", **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages.append(content)
+
+
+class FakeGuild:
+    """The guild as both the gateway cache and the REST API see it."""
+
+    def __init__(self, latency: float = 0.0):
+        self.id = GUILD_ID
+        self.chunked = True
+        self.latency = latency
+        self.everyone = FakeRole(GUILD_ID, "@everyone")
+        self.attendee_role = FakeRole(2, ATTENDEE_ROLE_NAME)
+        self.roles = [self.everyone, self.attendee_role]
+        self.channels = [FakeChannel(3, "logs", latency)]
+        self._members: dict[int, FakeMember] = {}
+        self.rest_calls = 0
+
+    def add_member(self, user_id: Optional[int] = None) -> FakeMember:
+        member = FakeMember(user_id or next(_ids), self.everyone, self.latency)
+        self._members[member.id] = member
+        return member
+
+    @property
+    def members(self) -> list[FakeMember]:
+        return list(self._members.values())
+
+    def get_member(self, user_id: int) -> Optional[FakeMember]:
+        return self._members.get(user_id)
+
+    async def fetch_member(self, user_id: int) -> FakeMember:
+        self.rest_calls += 1
+        await asyncio.sleep(self.latency)
+        member = self._members.get(user_id)
+        if member is None:
+            raise discord.NotFound(
+                SimpleNamespace(status=404, reason="Not Found"), "Unknown Member"
+            )
+        return member
+
+    async def fetch_roles(self):
+        self.rest_calls += 1
+        return list(self.roles)
+
+    async def fetch_channels(self):
+        self.rest_calls += 1
+        return list(self.channels)
+
+    async def fetch_members(self, limit=None):
+        self.rest_calls += 1
+        for member in self.members:
+            yield member
+
+
+class FakeBot:
+    def __init__(self, guild: FakeGuild):
+        self._guild = guild
+        self.application_id = 42
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self._guild if guild_id == self._guild.id else None
+
+
+def private_message(author: FakeUser, content: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        author=author,
+        content=content,
+        channel=SimpleNamespace(type=discord.ChannelType.private),
+    )
+
+
+class BenchmarkAuthenticationCog(AuthenticationCog):
+    """Runs the auth queue and log sink, but no periodic EventBrite sync."""
+
+    def _start_tasks(self):
+        self.auth_queue.start()
+        self.log_sink.start()
+
+    async def stop(self):
+        self.auth_queue.stop()
+        self.log_sink.stop()
+        await self.log_sink.flush()
+
+
+def build_auth_cog(
+    guild: FakeGuild,
+    index: AttendeesIndex,
+    eventbrite: Optional[EventBrite] = None,
+    **kwargs,
+) -> BenchmarkAuthenticationCog:
+    return BenchmarkAuthenticationCog(
+        FakeBot(guild),
+        guild,
+        eventbrite or fake_eventbrite(FakeEventBrite(attendees=0)),
+        index,
+        ATTENDEE_ROLE_NAME,
+        **kwargs,
+    )
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
@@ -0,0 +1,44 @@
+"""Time to suggest attendee emails for a mistyped one.
+
+Builds the fuzzy index over synthetic attendees and queries it with emails
+that lost one character of the local part.
+
+    $ poetry run python -m benchmarks.fuzzy_lookup 10000 100000
+"""
+import random
+import sys
+import time
+
+from benchmarks.index_memory import batches
+from pybr2022.auth.fuzzy import FuzzyEmailIndex
+
+QUERIES = 1000
+
+
+def typo(email: str, rng: random.Random) -> str:
+    position = rng.randrange(email.index("@"))
+    return email[:position] + email[position + 1 :]
+
+
+def main(sizes: list[int]):
+    print(f"{'attendees':>10} {'build_s':>10} {'query_ms':>10} {'recall':>10}")
+    for size in sizes:
+        emails = [data["email"].lower() for batch in batches(size) for data in batch]
+        index = FuzzyEmailIndex()
+        started_at = time.perf_counter()
+        index.update(emails)
+        build = time.perf_counter() - started_at
+
+        rng = random.Random(size)
+        expected = rng.sample(emails, QUERIES)
+        queries = [typo(email, rng) for email in expected]
+        started_at = time.perf_counter()
+        results = [index.suggest(query) for query in queries]
+        query = (time.perf_counter() - started_at) / QUERIES * 1000
+
+        recall = sum(email in result for email, result in zip(expected, results))
+        print(f"{size:>10} {build:>10.2f} {query:>10.3f} {recall / QUERIES:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,150 @@
+"""Memory used by the attendees index, in bytes per attendee.
+
+Compares the old dict based ``Attendee`` dataclass with the slotted model
+and with the membership only index mode.
+
+    $ poetry run python -m benchmarks.index_memory 10000 100000 1000000
+"""
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from pybr2022.auth.index import AttendeesIndex
+from pybr2022.auth.models import Attendee
+
+BATCH_SIZE = 10_000
+FIRST_NAMES = [
+    "Ana",
+    "Antônio",
+    "Beatriz",
+    "Bruno",
+    "Camila",
+    "Carlos",
+    "Daniela",
+    "Eduardo",
+    "Fernanda",
+    "Francisco",
+    "Gabriel",
+    "Helena",
+    "Isabela",
+    "João",
+    "José",
+    "Juliana",
+    "Larissa",
+    "Lucas",
+    "Luiz",
+    "Marcos",
+    "Maria",
+    "Mariana",
+    "Paulo",
+    "Pedro",
+    "Rafael",
+    "Renata",
+    "Sofia",
+]
+LAST_NAMES = [
+    "Almeida",
+    "Alves",
+    "Barbosa",
+    "Carvalho",
+    "Costa",
+    "Ferreira",
+    "Gomes",
+    "Lima",
+    "Martins",
+    "Oliveira",
+    "Pereira",
+    "Ribeiro",
+    "Rodrigues",
+    "Santos",
+    "Silva",
+    "Souza",
+]
+DOMAINS = ["gmail.com", "hotmail.com", "outlook.com", "yahoo.com.br"]
+
+
+@dataclass
+class DictAttendee:
+    """``Attendee`` as it was before slots and interning."""
+
+    order_id: str
+    first_name: str
+    last_name: str
+    email: str
+
+    @staticmethod
+    def from_cache(data: dict):
+        return DictAttendee(
+            order_id=data["order_id"],
+            first_name=data["first_name"],
+            last_name=data["last_name"],
+            email=data["email"],
+        )
+
+
+def batches(size: int):
+    """Yield attendees as freshly parsed JSON, like the cache loader does."""
+    rng = random.Random(size)
+    for start in range(0, size, BATCH_SIZE):
+        records = []
+        for number in range(start, min(start + BATCH_SIZE, size)):
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = rng.choice(LAST_NAMES)
+            records.append(
+                {
+                    "order_id": str(1_000_000_000 + number),
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "email": f"{first_name}.{last_name}{number}@{rng.choice(DOMAINS)}",
+                }
+            )
+        yield json.loads(json.dumps(records))
+
+
+def build_dict_index(size: int):
+    index = {}
+    for batch in batches(size):
+        for data in batch:
+            attendee = DictAttendee.from_cache(data)
+            index[attendee.email.lower()] = attendee
+    return index
+
+
+def build_attendees_index(size: int, membership_only: bool = False):
+    index = AttendeesIndex(Path("unused.json"), membership_only=membership_only)
+    for batch in batches(size):
+        index.add_many(Attendee.from_cache(data) for data in batch)
+    return index
+
+
+def bytes_per_attendee(size: int, build, **kwargs) -> float:
+    gc.collect()
+    tracemalloc.start()
+    index = build(size, **kwargs)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del index
+    return used / size
+
+
+def main(sizes: list[int]):
+    logger.remove()
+    print(f"{'attendees':>10} {'dataclass':>10} {'slots':>10} {'membership':>10}")
+    for size in sizes:
+        before = bytes_per_attendee(size, build_dict_index)
+        slots = bytes_per_attendee(size, build_attendees_index)
+        membership = bytes_per_attendee(
+            size, build_attendees_index, membership_only=True
+        )
+        print(f"{size:>10} {before:>10.1f} {slots:>10.1f} {membership:>10.1f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
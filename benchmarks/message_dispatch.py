@@ -0,0 +1,155 @@
+"""Cost of guild chat for the authentication listener, before and after the
+``on_private_message`` prefilter and the trimmed intents.
+
+``dispatch`` runs offline: it feeds fake messages, mostly guild chat, to a bot
+listening with ``on_message`` as the auth cog used to, and to one listening
+to ``on_private_message``, then reports the time spent per message.
+
+``gateway`` needs the bot token: it connects once with ``Intents.all()`` and
+once with ``build_intents()`` and counts the bytes and events received.
+
+    $ poetry run python -m benchmarks.message_dispatch dispatch 100000
+    $ poetry run python -m benchmarks.message_dispatch gateway 300
+"""
+import asyncio
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+from loguru import logger
+
+from pybr2022.bot import Bot, build_intents, is_private_message
+
+PRIVATE_RATIO = 0.01
+
+
+class OnMessageCog(commands.Cog):
+    """The auth listener as it was: every message reaches ``authenticate``."""
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        await self.authenticate(message)
+
+    async def authenticate(self, message):
+        if not is_private_message(message):
+            return
+
+
+class OnPrivateMessageCog(commands.Cog):
+    @commands.Cog.listener()
+    async def on_private_message(self, message):
+        pass
+
+
+class BeforeBot(commands.Bot):
+    async def on_message(self, message):
+        # Command handling costs the same in both runs, leave it out.
+        pass
+
+
+class AfterBot(Bot):
+    async def setup_hook(self):
+        pass
+
+    async def on_message(self, message):
+        pass
+
+
+def fake_messages(count: int) -> list:
+    private_every = int(1 / PRIVATE_RATIO)
+    messages = []
+    for number in range(count):
+        private = number % private_every == 0
+        messages.append(
+            SimpleNamespace(
+                author=SimpleNamespace(bot=False),
+                channel=SimpleNamespace(
+                    type=discord.ChannelType.private
+                    if private
+                    else discord.ChannelType.text
+                ),
+            )
+        )
+    return messages
+
+
+async def drain():
+    current = asyncio.current_task()
+    while tasks := [task for task in asyncio.all_tasks() if task is not current]:
+        await asyncio.gather(*tasks)
+
+
+async def time_dispatch(bot_class, cog_class, messages: list) -> float:
+    bot = bot_class(command_prefix="pybr!", intents=build_intents())
+    await bot._async_setup_hook()
+    await bot.add_cog(cog_class())
+
+    started_at = time.perf_counter()
+    for message in messages:
+        bot.dispatch("message", message)
+    await drain()
+    elapsed = time.perf_counter() - started_at
+
+    await bot.close()
+    return elapsed / len(messages) * 1_000_000
+
+
+async def dispatch(count: int):
+    messages = fake_messages(count)
+    before = await time_dispatch(BeforeBot, OnMessageCog, messages)
+    after = await time_dispatch(AfterBot, OnPrivateMessageCog, messages)
+    print(f"{'messages':>10} {'before_us':>10} {'after_us':>10}")
+    print(f"{count:>10} {before:>10.2f} {after:>10.2f}")
+
+
+async def record_gateway(intents: discord.Intents, seconds: float) -> tuple:
+    from pybr2022 import config
+
+    client = discord.Client(intents=intents, enable_debug_events=True)
+    received = Counter()
+    events = Counter()
+
+    @client.event
+    async def on_socket_raw_receive(message):
+        received["bytes"] += len(message)
+
+    @client.event
+    async def on_socket_event_type(event_type):
+        events[event_type] += 1
+
+    async with client:
+        task = asyncio.create_task(client.start(config.DISCORD_TOKEN))
+        await asyncio.sleep(seconds)
+        await client.close()
+        await asyncio.gather(task, return_exceptions=True)
+
+    return received["bytes"], events
+
+
+async def gateway(seconds: float):
+    for name, intents in (
+        ("all", discord.Intents.all()),
+        ("trimmed", build_intents()),
+    ):
+        received, events = await record_gateway(intents, seconds)
+        print(f"intents={name} bytes={received} events={sum(events.values())}")
+        for event_type, count in events.most_common(10):
+            print(f"    {event_type:<30} {count:>8}")
+
+
+def main(args: list[str]):
+    logger.remove()
+    command, *rest = args or ["dispatch"]
+    if command == "dispatch":
+        asyncio.run(dispatch(int(rest[0]) if rest else 100_000))
+    elif command == "gateway":
+        asyncio.run(gateway(float(rest[0]) if rest else 300))
+    else:
+        raise SystemExit(__doc__)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,194 @@
+"""Throughput of the bot against local fakes, no network or tokens needed.
+
+Scenarios:
+
+- ``sync``: a full EventBrite pull into ``AttendeesIndex`` through paged,
+  slow and sometimes throttled fake responses.
+- ``auth``: a burst of DMs through ``AuthenticationCog`` and its queue,
+  backed by a fake guild, with most emails valid.
+- ``talks``: a cold and a warm (304) Pretalx schedule fetch.
+
+    $ poetry run python -m benchmarks.offline --attendees 100000 --dms 5000
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+
+from benchmarks.fakes import (
+    FakeEventBrite,
+    FakeGuild,
+    FakePretalx,
+    attendee_email,
+    build_auth_cog,
+    fake_eventbrite,
+    fake_pretalx,
+    percentile,
+    private_message,
+)
+from pybr2022.auth.index import AttendeesIndex
+from pybr2022.auth.models import Attendee
+
+
+@contextmanager
+def peak_memory(result: dict, enabled: bool):
+    if not enabled:
+        yield
+        return
+
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+
+
+def build_index(attendees: int) -> AttendeesIndex:
+    index = AttendeesIndex(Path("unused.json"))
+    index.add_many(
+        Attendee(
+            order_id=str(number),
+            first_name="",
+            last_name="",
+            email=attendee_email(number),
+        )
+        for number in range(attendees)
+    )
+    return index
+
+
+async def bench_sync(args) -> dict:
+    result = {}
+    server = FakeEventBrite(
+        attendees=args.attendees,
+        page_size=args.page_size,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+    )
+    eventbrite = fake_eventbrite(server)
+    index = AttendeesIndex(Path("unused.json"))
+    with peak_memory(result, args.memory):
+        started_at = time.perf_counter()
+        with index.transaction():
+            async for attendees in eventbrite.iter_attendees():
+                index.add_many(attendees)
+        result["wall_s"] = time.perf_counter() - started_at
+
+    await eventbrite.aclose()
+    result.update(
+        attendees=len(index),
+        requests=server.stats.requests,
+        throttled=server.stats.throttled,
+    )
+    return result
+
+
+async def bench_auth(args) -> dict:
+    result = {}
+    index = build_index(args.attendees)
+    guild = FakeGuild(latency=args.discord_latency)
+    cog = build_auth_cog(guild, index, auth_workers=args.workers)
+    # The cog builds the fuzzy index after each EventBrite sync.
+    await cog._refresh_fuzzy_index()
+
+    rng = random.Random(0)
+    messages = []
+    for _ in range(args.dms):
+        member = guild.add_member()
+        if rng.random() < args.valid_ratio:
+            content = attendee_email(rng.randrange(args.attendees))
+        else:
+            content = f"nao-inscrito{member.id}@example.com"
+        messages.append(private_message(member, content))
+
+    with peak_memory(result, args.memory):
+        started_at = time.perf_counter()
+        submitted = {}
+        for message in messages:
+            submitted[message.author.id] = time.perf_counter()
+            await cog.on_private_message(message)
+        await cog.auth_queue.join()
+        wall = time.perf_counter() - started_at
+
+    await cog.stop()
+    latencies = [
+        message.author.replies[0][0] - submitted[message.author.id]
+        for message in messages
+        if message.author.replies
+    ]
+    result.update(
+        dms=len(messages),
+        dms_per_s=len(messages) / wall,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        granted=sum(1 for member in guild.members if len(member.roles) > 1),
+        rest_calls=guild.rest_calls,
+    )
+    return result
+
+
+async def bench_talks(args) -> dict:
+    result = {}
+    server = FakePretalx(latency=args.latency, throttle_rate=args.throttle_rate)
+    pretalx = fake_pretalx(server)
+    with peak_memory(result, args.memory):
+        started_at = time.perf_counter()
+        talks = await pretalx.talks()
+        result["cold_ms"] = (time.perf_counter() - started_at) * 1000
+        started_at = time.perf_counter()
+        await pretalx.talks()
+        result["warm_ms"] = (time.perf_counter() - started_at) * 1000
+
+    await pretalx.aclose()
+    result.update(
+        talks=len(talks),
+        requests=server.stats.requests,
+        not_modified=server.stats.not_modified,
+    )
+    return result
+
+
+SCENARIOS = {"sync": bench_sync, "auth": bench_auth, "talks": bench_talks}
+
+
+def format_result(name: str, result: dict) -> str:
+    values = ", ".join(
+        f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+        for key, value in result.items()
+    )
+    return f"{name:<6} {values}"
+
+
+async def run(args):
+    for name in args.scenarios:
+        print(format_result(name, await SCENARIOS[name](args)), flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS))
+    parser.add_argument("--attendees", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="HTTP, seconds")
+    parser.add_argument("--throttle-rate", type=float, default=0.02)
+    parser.add_argument("--dms", type=int, default=5000)
+    parser.add_argument("--valid-ratio", type=float, default=0.8)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--discord-latency", type=float, default=0.005)
+    parser.add_argument("--no-memory", dest="memory", action="store_false")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logger.remove()
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
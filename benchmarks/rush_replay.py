@@ -0,0 +1,201 @@
+"""Replay a registration rush against ``AuthenticationCog``.
+
+Right after ``pybr!boasvindas`` thousands of members DM the bot within a
+few minutes. This generates such a burst (or replays a recorded one) at a
+given arrival rate against a fake guild, and reports the queueing delay,
+the reply latency percentiles and the role grant throughput.
+
+Bursts are JSON lines of ``{"at", "user", "kind", "content"}``, ``at``
+being seconds since the first message; ``--save`` writes the generated one.
+
+    $ poetry run python -m benchmarks.rush_replay --rate 50 --dms 3000
+    $ poetry run python -m benchmarks.rush_replay --replay rush.jsonl --speed 2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from benchmarks.fakes import (
+    FakeGuild,
+    attendee_email,
+    build_auth_cog,
+    percentile,
+    private_message,
+)
+from benchmarks.offline import build_index
+from pybr2022.auth.queue import QUEUE_WAIT
+
+# Share of each kind of DM in a generated burst.
+DEFAULT_MIX = {
+    "valid": 0.70,
+    "typo": 0.10,
+    "no_email": 0.08,
+    "authenticated": 0.07,
+    # Someone who failed before and sends the fixed email.
+    "retry": 0.05,
+}
+
+
+@dataclass
+class Arrival:
+    at: float
+    user: int
+    kind: str
+    content: str
+
+
+def typo(email: str, rng: random.Random) -> str:
+    position = rng.randrange(email.index("@"))
+    return email[:position] + email[position + 1 :]
+
+
+def generate(dms: int, rate: float, attendees: int, seed: int = 0) -> list[Arrival]:
+    """Poisson arrivals at ``rate`` DMs per second."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*DEFAULT_MIX.items())
+    arrivals = []
+    failed: list[tuple[int, str]] = []
+    at = 0.0
+    for user in range(10_000, 10_000 + dms):
+        at += rng.expovariate(rate)
+        kind = rng.choices(kinds, weights)[0]
+        email = attendee_email(rng.randrange(attendees))
+        if kind == "retry" and failed:
+            user, email = failed.pop(rng.randrange(len(failed)))
+            content = email
+        elif kind == "typo":
+            content = typo(email, rng)
+            failed.append((user, email))
+        elif kind == "no_email":
+            content = "oi, quero me credenciar"
+        else:
+            kind = "valid" if kind == "retry" else kind
+            content = f"meu email é {email}"
+        arrivals.append(Arrival(at, user, kind, content))
+    return arrivals
+
+
+def load(path: Path) -> list[Arrival]:
+    with path.open() as fp:
+        return [Arrival(**json.loads(line)) for line in fp if line.strip()]
+
+
+def save(arrivals: list[Arrival], path: Path):
+    with path.open("w") as fp:
+        for arrival in arrivals:
+            fp.write(json.dumps(asdict(arrival), ensure_ascii=False) + "\n")
+
+
+async def replay(arrivals: list[Arrival], args) -> dict:
+    index = build_index(args.attendees)
+    guild = FakeGuild(latency=args.discord_latency)
+    members = {}
+    for arrival in arrivals:
+        if arrival.user not in members:
+            members[arrival.user] = member = guild.add_member(arrival.user)
+            if arrival.kind == "authenticated":
+                member.roles.append(guild.attendee_role)
+
+    cog = build_auth_cog(
+        guild,
+        index,
+        auth_workers=args.workers,
+        auth_queue_size=args.queue_size,
+    )
+    await cog._refresh_fuzzy_index()
+    wait_count, wait_sum = QUEUE_WAIT.count, QUEUE_WAIT.sum
+
+    sent_at: dict[int, list[float]] = {}
+    started_at = time.perf_counter()
+    for arrival in arrivals:
+        delay = started_at + arrival.at / args.speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        member = members[arrival.user]
+        sent_at.setdefault(member.id, []).append(time.perf_counter())
+        await cog.on_private_message(private_message(member, arrival.content))
+
+    await cog.auth_queue.join()
+    finished_at = time.perf_counter()
+    await cog.stop()
+
+    latencies = []
+    for user_id, times in sent_at.items():
+        replies = members[user_id].replies
+        # Deduplicated messages share a reply, pair each reply with the
+        # first message still waiting for one.
+        for sent, (replied, _) in zip(times, replies):
+            latencies.append(replied - sent)
+
+    granted = [
+        member.role_granted_at
+        for member in members.values()
+        if member.role_granted_at is not None
+    ]
+    grant_window = (max(granted) - started_at) if granted else 0
+    waits = QUEUE_WAIT.count - wait_count
+    stats = cog.auth_queue.stats
+    return {
+        "dms": len(arrivals),
+        "offered_rate": len(arrivals) / (arrivals[-1].at / args.speed or 1),
+        "wall_s": finished_at - started_at,
+        "queue_wait_avg_ms": (QUEUE_WAIT.sum - wait_sum) / (waits or 1) * 1000,
+        "queue_wait_p99_ms": QUEUE_WAIT.percentile(99) * 1000,
+        "max_depth": stats.max_depth,
+        "deduplicated": stats.deduplicated,
+        "rejected": stats.rejected,
+        "reply_p50_ms": percentile(latencies, 50) * 1000,
+        "reply_p90_ms": percentile(latencies, 90) * 1000,
+        "reply_p99_ms": percentile(latencies, 99) * 1000,
+        "unanswered": len(arrivals) - len(latencies),
+        "roles_granted": len(granted),
+        "grants_per_s": len(granted) / grant_window if grant_window else 0.0,
+        "log_posts": len(guild.channels[0].messages),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--dms", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=50.0, help="DMs per second")
+    parser.add_argument("--attendees", type=int, default=100_000)
+    parser.add_argument("--replay", type=Path, help="recorded burst to replay")
+    parser.add_argument("--save", type=Path, help="write the generated burst")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=5000)
+    parser.add_argument("--discord-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logger.remove()
+    args = parse_args(argv)
+    if args.replay:
+        arrivals = load(args.replay)
+    else:
+        arrivals = generate(args.dms, args.rate, args.attendees, args.seed)
+    if args.save:
+        save(arrivals, args.save)
+
+    kinds = Counter(arrival.kind for arrival in arrivals)
+    print("mix " + ", ".join(f"{kind}={count}" for kind, count in kinds.items()))
+    result = asyncio.run(replay(arrivals, args))
+    for key, value in result.items():
+        print(
+            f"{key:<18} {value:.2f}"
+            if isinstance(value, float)
+            else f"{key:<18} {value}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,50 @@
+import asyncio
 import re
+import tempfile
+import time
+from datetime import datetime, timedelta
 from typing import Optional
 
 import discord
 from discord.ext import commands, tasks
 from loguru import logger
 
+from pybr2022.bot import is_private_message
+from pybr2022.metrics import metrics
+from pybr2022.ratelimit import TokenBucket
 from pybr2022.utils import render_template
 from .eventbrite import EventBrite
+from .fuzzy import FuzzyEmailIndex
 from .index import AttendeesIndex
+from .logsink import BatchedLogSink
+from .members import MemberTracker, write_members_csv
+from .pending import PendingVerifications
+from .queue import AuthQueue
+from .throttle import NegativeCache, UserRateLimiter
 
 LOGGER_CHANNEL = "logs"
+# Role edits go through the Discord REST API, keep the sweep well below
+# the per route limits.
+DEFAULT_SWEEP_RATE = 5.0
+DEFAULT_SWEEP_BURST = 5
+# Each user may try a few times in a row, then once every 30 seconds.
+DEFAULT_USER_AUTH_RATE = 1 / 30
+DEFAULT_USER_AUTH_BURST = 5
+# Pull everything and drop what EventBrite no longer has every few hours,
+# in case a change slipped between two incremental syncs.
+DEFAULT_FULL_RESYNC_INTERVAL = 6 * 3600
+# Incremental syncs start a bit before the previous one did, our clock and
+# EventBrite's don't have to agree.
+SYNC_OVERLAP = timedelta(minutes=1)
+# Bound once, so recording on the auth hot path is a couple of attribute
+# lookups away.
+AUTH_TOTAL = metrics.histogram("auth_seconds")
+MEMBER_FETCH = metrics.histogram("auth_stage_seconds", stage="member_fetch")
+EMAIL_REGEX_MATCH = metrics.histogram("auth_stage_seconds", stage="regex")
+INDEX_LOOKUP = metrics.histogram("auth_stage_seconds", stage="index_lookup")
+ROLE_ADD = metrics.histogram("auth_stage_seconds", stage="role_add")
+DM_SEND = metrics.histogram("auth_stage_seconds", stage="dm_send")
+EVENTBRITE_SYNC = metrics.histogram("eventbrite_sync_seconds")
 EMAIL_REGEX = re.compile(r"([a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)")
 
 
@@ -28,6 +63,15 @@ class AuthenticationCog(commands.Cog):
         event_brite_client: EventBrite,
         attendees_index: AttendeesIndex,
         attendee_role_name: str,
+        pending_verifications: Optional[PendingVerifications] = None,
+        sweep_limiter: Optional[TokenBucket] = None,
+        auth_workers: int = 8,
+        auth_queue_size: int = 5000,
+        log_flush_interval: float = 5.0,
+        log_max_records: int = 20,
+        user_limiter: Optional[UserRateLimiter] = None,
+        negative_cache: Optional[NegativeCache] = None,
+        full_resync_interval: float = DEFAULT_FULL_RESYNC_INTERVAL,
     ) -> None:
         self.bot = bot
         self.attendees_index = attendees_index
@@ -36,43 +80,219 @@ class AuthenticationCog(commands.Cog):
         self._guild = guild
         self._attendee_role = None
         self._channels = None
+        # Members fetched over REST because the gateway cache missed them.
+        self._members: dict[int, discord.Member] = {}
+        self.member_tracker = MemberTracker()
+        self.pending_verifications = pending_verifications or PendingVerifications()
+        self._sweep_limiter = sweep_limiter or TokenBucket(
+            DEFAULT_SWEEP_RATE, DEFAULT_SWEEP_BURST
+        )
+        self._user_limiter = user_limiter or UserRateLimiter(
+            DEFAULT_USER_AUTH_RATE, DEFAULT_USER_AUTH_BURST
+        )
+        self._negative_cache = negative_cache or NegativeCache()
+        self._full_resync_interval = full_resync_interval
+        self._last_full_resync: Optional[float] = None
+        self._sync_checkpoint: Optional[datetime] = None
+        self.fuzzy_index = FuzzyEmailIndex()
+        self._fuzzy_version: Optional[int] = None
+        self.auth_queue = AuthQueue(
+            self.authenticate,
+            auth_workers,
+            auth_queue_size,
+            replaces=self._replaces_queued_message,
+        )
+        self.log_sink = BatchedLogSink(
+            lambda: self._get_channel(LOGGER_CHANNEL),
+            log_flush_interval,
+            log_max_records,
+            busy=self._is_busy,
+        )
         self._start_tasks()
 
     def _start_tasks(self):
         self._load_attendees.start()
+        self.auth_queue.start()
+        self.log_sink.start()
 
     @tasks.loop(minutes=5)
     async def _load_attendees(self):
         try:
-            last_update = self.attendees_index.updated_at
-            new_attendees = await self.eventbrite.list_attendees(last_update)
-            for attendee in new_attendees:
-                self.attendees_index.add(attendee)
+            await self.attendees_index.wait_loaded()
+            if self._sync_checkpoint is None:
+                self._sync_checkpoint = self.attendees_index.updated_at
+
+            started_at = datetime.utcnow()
+            with EVENTBRITE_SYNC.time(), self.attendees_index.transaction():
+                if self._is_full_resync_due():
+                    await self._full_resync()
+                else:
+                    await self._sync_changes(self._sync_checkpoint - SYNC_OVERLAP)
+            self._sync_checkpoint = started_at
+            await self._verify_pending()
+            await self._refresh_fuzzy_index()
         except Exception:
             logger.exception("Error while loading attendees from EventBrite")
 
-    def _is_private_message(self, message: discord.Message) -> bool:
-        conditions = (
-            not message.author.bot,
-            message.channel.type == discord.ChannelType.private,
+    def _is_full_resync_due(self) -> bool:
+        if self._sync_checkpoint is None:
+            return True
+        if self._last_full_resync is None:
+            # The cache was synced before the restart, count from now on.
+            self._last_full_resync = time.monotonic()
+        return time.monotonic() - self._last_full_resync >= self._full_resync_interval
+
+    async def _sync_changes(self, changed_since: datetime):
+        """Apply the tickets bought, changed or cancelled since the checkpoint."""
+        added = removed = 0
+        async for active, inactive in self.eventbrite.iter_changes(changed_since):
+            added += self.attendees_index.add_many(active)
+            removed += self.attendees_index.remove_many(
+                attendee.id for attendee in inactive if attendee.id
+            )
+        logger.info(
+            f"Attendees changes synced. changed_since={changed_since!r}, active={added}, removed={removed}"
+        )
+
+    async def _full_resync(self):
+        """Pull every attendee and remove the ones EventBrite no longer has.
+
+        The index is diffed in place, so lookups keep working and unchanged
+        attendees cause no writes.
+        """
+        seen: set[str] = set()
+        pulled = without_id = 0
+        async for attendees in self.eventbrite.iter_attendees():
+            self.attendees_index.add_many(attendees)
+            pulled += len(attendees)
+            for attendee in attendees:
+                if attendee.id:
+                    seen.add(attendee.id)
+                else:
+                    without_id += 1
+
+        removed = 0
+        if not pulled:
+            # Most likely a bad response, don't wipe the index over it.
+            logger.warning("EventBrite returned no attendees, nothing removed")
+        elif without_id:
+            # They can't be told apart from stale entries, keep everything.
+            logger.warning(
+                f"EventBrite attendees without id, nothing removed. attendees={pulled}, without_id={without_id}"
+            )
+        else:
+            removed = self.attendees_index.retain(seen)
+        self._last_full_resync = time.monotonic()
+        logger.info(
+            f"Attendees full resync finished. attendees={pulled}, removed={removed}"
+        )
+
+    async def _verify_member(self, user_id: int, role: discord.Role) -> bool:
+        member = await self._get_user_from_server(discord.Object(id=user_id))
+        if not member or not await self._is_auth_needed(member):
+            return False
+
+        async with self._sweep_limiter.slot():
+            await member.add_roles(role)
+
+        logger.info(f"User authenticated by the sweep. user_id={user_id}")
+        try:
+            await member.send(render_template("auth/authenticated"))
+        except discord.HTTPException:
+            logger.warning(f"Could not notify authenticated user. user_id={user_id}")
+        return True
+
+    async def _verify_pending(self):
+        """Give the attendee role to failed attempts that now match."""
+        matches = self.pending_verifications.match(self.attendees_index.keys())
+        if not matches:
+            return
+
+        role = await self._get_attendee_role()
+        user_ids = list(matches)
+        batch_size = self._sweep_limiter.capacity
+        verified = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start : start + batch_size]
+            results = await asyncio.gather(
+                *(self._verify_member(user_id, role) for user_id in batch),
+                return_exceptions=True,
+            )
+            for user_id, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    logger.opt(exception=result).error(
+                        f"Error while verifying pending user. user_id={user_id}"
+                    )
+                elif result:
+                    verified += 1
+
+        logger.info(
+            f"Pending verifications swept. matches={len(matches)}, verified={verified}, "
+            f"pending={len(self.pending_verifications)}"
+        )
+
+    async def cog_unload(self):
+        self._load_attendees.cancel()
+        self.auth_queue.stop()
+        self.log_sink.stop()
+        await self.log_sink.flush()
+        await self.attendees_index.flush()
+        await self.eventbrite.aclose()
+
+    @staticmethod
+    def _replaces_queued_message(
+        queued: discord.Message, message: discord.Message
+    ) -> bool:
+        # A "thanks" sent right after the email must not hide the attempt.
+        return find_email(message.content) is not None or (
+            find_email(queued.content) is None
         )
-        return all(conditions)
+
+    def _is_private_message(self, message: discord.Message) -> bool:
+        return is_private_message(message)
+
+    def _get_cached_guild(self) -> Optional[discord.Guild]:
+        """The guild as seen by the gateway, kept up to date by discord.py."""
+        return self.bot.get_guild(self._guild.id)
 
     async def _get_user_from_server(
         self, user: discord.Member
     ) -> Optional[discord.Member]:
-        return await self._guild.fetch_member(user.id)
+        guild = self._get_cached_guild()
+        member = guild.get_member(user.id) if guild else None
+        if member is None:
+            member = self._members.get(user.id)
+        if member is None:
+            try:
+                member = await self._guild.fetch_member(user.id)
+            except discord.NotFound:
+                return None
+            logger.info(f"Member fetched from the API. user_id={user.id}")
+            self._members[user.id] = member
+        return member
 
     async def _get_channel(self, name: str) -> Optional[discord.TextChannel]:
+        guild = self._get_cached_guild()
+        if guild:
+            channel = discord.utils.get(guild.channels, name=name)
+            if channel:
+                return channel
+
         if not self._channels:
             self._channels = await self._guild.fetch_channels()
 
         return discord.utils.get(self._channels, name=name)
 
     async def _is_auth_needed(self, user: discord.Member) -> bool:
-        return len(user.roles) == 1
+        return MemberTracker.needs_auth(user)
 
     async def _get_attendee_role(self):
+        guild = self._get_cached_guild()
+        if guild:
+            role = discord.utils.get(guild.roles, name=self._attendee_role_name)
+            if role:
+                return role
+
         if not self._attendee_role:
             roles = await self._guild.fetch_roles()
             self._attendee_role = discord.utils.get(
@@ -81,74 +301,210 @@ class AuthenticationCog(commands.Cog):
 
         return self._attendee_role
 
+    async def _populate_member_tracker(self):
+        self.member_tracker.reset()
+        guild = self._get_cached_guild()
+        if guild and guild.chunked:
+            for member in guild.members:
+                self.member_tracker.update(member)
+        else:
+            async for member in self._guild.fetch_members(limit=None):
+                self.member_tracker.update(member)
+
+        self.member_tracker.ready = True
+        logger.info(
+            f"Member tracker populated. unauthenticated={len(self.member_tracker)}"
+        )
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        self.member_tracker.update(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if after.id in self._members:
+            self._members[after.id] = after
+        self.member_tracker.update(after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        self._members.pop(member.id, None)
+        self.member_tracker.remove(member)
+        self.pending_verifications.discard(member.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if self._attendee_role and self._attendee_role.id == after.id:
+            self._attendee_role = (
+                after if after.name == self._attendee_role_name else None
+            )
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        if self._attendee_role and self._attendee_role.id == role.id:
+            self._attendee_role = None
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        self._channels = None
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        self._channels = None
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self._channels = None
+
     async def _set_attendee_role(self, member: discord.Member):
         attendee_role = await self._get_attendee_role()
-        await member.add_roles(attendee_role)
+        with ROLE_ADD.time():
+            await member.add_roles(attendee_role)
+
+    async def _refresh_fuzzy_index(self):
+        """Bring the suggestions up to date with the attendees index.
+
+        The first build takes seconds for a full index, so it runs in a
+        thread on a new index that replaces the current one when done. Later
+        syncs only change a handful of emails and are applied in place.
+        """
+        version = self.attendees_index.version
+        if version == self._fuzzy_version:
+            return
 
-    async def _log_auth_failed(self, message: discord.Message):
+        emails = set(self.attendees_index.keys())
+        if len(self.fuzzy_index):
+            added, removed = self.fuzzy_index.sync(emails)
+        else:
+            fuzzy_index = FuzzyEmailIndex()
+            added, removed = await asyncio.to_thread(fuzzy_index.update, emails), 0
+            self.fuzzy_index = fuzzy_index
+        self._fuzzy_version = version
+        logger.info(
+            f"Fuzzy email index updated. added={added}, removed={removed}, size={len(self.fuzzy_index)}"
+        )
+
+    def _suggest_emails(self, email: str) -> list[str]:
+        """Attendee emails close to ``email``, for admins to double check."""
+        return self.fuzzy_index.suggest(email)
+
+    async def _log_auth_failed(
+        self, message: discord.Message, email: Optional[str] = None
+    ):
+        suggestions = self._suggest_emails(email) if email else []
         log_message = render_template(
-            "pybr2022/auth/templates/log_user_not_found.md",
+            "auth/log_user_not_found",
             user_id=message.author.id,
             query=message.content,
+            suggestions=", ".join(f"`{email}`" for email in suggestions) or "-",
         )
-        channel = await self._get_channel(LOGGER_CHANNEL)
-        await channel.send(log_message)
+        self.log_sink.add(log_message)
+
+    def _is_busy(self) -> bool:
+        return bool(self.auth_queue.depth or self.auth_queue.active)
+
+    async def _reply(self, message: discord.Message, reply: str):
+        with DM_SEND.time():
+            await message.author.send(reply)
+
+    def _count_result(self, result: str):
+        metrics.inc("auth_results", result=result)
 
     async def authenticate(self, message: discord.Message):
+        with AUTH_TOTAL.time():
+            await self._authenticate(message)
+
+    async def _authenticate(self, message: discord.Message):
         if not self._is_private_message(message):
             return
 
-        user = await self._get_user_from_server(message.author)
+        if not self._user_limiter.try_acquire(message.author.id):
+            logger.warning(f"User throttled. author={message.author!r}")
+            self._count_result("throttled")
+            return
+
+        with MEMBER_FETCH.time():
+            user = await self._get_user_from_server(message.author)
         if not user:
+            self._count_result("not_in_server")
             reply = render_template(
-                "pybr2022/auth/templates/user_not_in_server.md",
+                "auth/user_not_in_server",
                 user_id=message.author.id,
             )
-            await message.author.send(reply)
+            await self._reply(message, reply)
             return
 
         if not await self._is_auth_needed(user):
+            self._count_result("already_authenticated")
             reply = render_template(
-                "pybr2022/auth/templates/user_already_authenticated.md",
+                "auth/user_already_authenticated",
                 user_id=message.author.id,
             )
-            await message.author.send(reply)
+            await self._reply(message, reply)
             return
 
-        email = find_email(message.content.lower())
+        with EMAIL_REGEX_MATCH.time():
+            email = find_email(message.content.lower())
         if not email:
+            self._count_result("email_missing")
             logger.warning(
                 f"Email not found in message. author={message.author!r}, message={message.content!r}"
             )
             reply = render_template(
-                "pybr2022/auth/templates/email_missing.md",
+                "auth/email_missing",
                 user_id=message.author.id,
             )
-            await message.author.send(reply)
+            await self._reply(message, reply)
             await self._log_auth_failed(message)
             return
 
-        if self.attendees_index.search(email):
+        failed_key = (message.author.id, email)
+        if self._negative_cache.hit(failed_key, self.attendees_index.version):
+            self._count_result("cached_failure")
+            logger.info(
+                f"Failed authentication repeated. author={message.author!r}, email={email!r}"
+            )
+            reply = render_template(
+                "auth/auth_failed",
+                previous_message=message.content,
+            )
+            await self._reply(message, reply)
+            return
+
+        with INDEX_LOOKUP.time():
+            found = email in self.attendees_index
+        if not found and not self.attendees_index.loaded:
+            await self.attendees_index.wait_loaded()
+            found = email in self.attendees_index
+
+        if found:
+            self._count_result("authenticated")
             logger.info(
                 f"User authenticated. author={message.author!r}, message={message.content!r}"
             )
             await self._set_attendee_role(user)
-            reply = render_template("pybr2022/auth/templates/authenticated.md")
-            await message.author.send(reply)
+            self.pending_verifications.discard(message.author.id)
+            reply = render_template("auth/authenticated")
+            await self._reply(message, reply)
         else:
+            self._count_result("failed")
             logger.warning(
                 f"Failed to authenticate user. author={message.author!r}, message={message.content!r}"
             )
+            self.pending_verifications.record(message.author.id, email)
+            self._negative_cache.add(failed_key, self.attendees_index.version)
             reply = render_template(
-                "pybr2022/auth/templates/auth_failed.md",
+                "auth/auth_failed",
                 previous_message=message.content,
             )
-            await message.author.send(reply)
-            await self._log_auth_failed(message)
+            await self._reply(message, reply)
+            await self._log_auth_failed(message, email)
 
     @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        await self.authenticate(message)
+    async def on_private_message(self, message: discord.Message):
+        if not self.auth_queue.submit(message.author.id, message):
+            reply = render_template("auth/auth_busy", user_id=message.author.id)
+            await message.author.send(reply)
 
     @commands.command("verificar_participante")
     @commands.has_permissions(manage_guild=True)
@@ -159,10 +515,17 @@ class AuthenticationCog(commands.Cog):
         *args,
     ):
         email = email.lower()
-        if self.attendees_index.search(email):
+        if email in self.attendees_index:
             await context.reply(f"✅ Email `{email}` encontrado no Eventbrite")
-        else:
-            await context.reply(f"❌ Email `{email}` **não** encontrado no Eventbrite")
+            return
+
+        reply = f"❌ Email `{email}` **não** encontrado no Eventbrite"
+        suggestions = self._suggest_emails(email)
+        if suggestions:
+            reply += "\nVocê quis dizer: " + ", ".join(
+                f"`{suggestion}`" for suggestion in suggestions
+            )
+        await context.reply(reply)
 
     @commands.command("eventbrite")
     @commands.has_permissions(manage_guild=True)
@@ -173,8 +536,10 @@ class AuthenticationCog(commands.Cog):
     ):
         await context.reply(
             "Eventbrite Index:\n"
-            f"- Size: `{len(self.attendees_index._index)}`\n"
-            f"- Updated at: `{self.attendees_index.updated_at}`"
+            f"- Size: `{len(self.attendees_index)}`\n"
+            f"- Updated at: `{self.attendees_index.updated_at}`\n"
+            f"- Connections: `{self.eventbrite.connection_stats}`\n"
+            f"- Auth queue: `{self.auth_queue}`"
         )
 
     @commands.command("credenciamento")
@@ -184,14 +549,20 @@ class AuthenticationCog(commands.Cog):
         context: commands.Context,
         *args,
     ):
-        members_missing_auth = []
-        async for member in context.guild.fetch_members(limit=None):
-            if len(member.roles) == 1:
-                members_missing_auth.append(member)
+        if not self.member_tracker.ready:
+            await self._populate_member_tracker()
 
-        await context.reply(
-            f"Pessoas não credenciadas: {len(members_missing_auth)}"
-        )
+        reply = f"Pessoas não credenciadas: {len(self.member_tracker)}"
+        if "csv" not in args:
+            await context.reply(reply)
+            return
+
+        with tempfile.TemporaryFile() as fp:
+            write_members_csv(self.member_tracker, self._get_cached_guild(), fp)
+            fp.seek(0)
+            await context.reply(
+                reply, file=discord.File(fp, filename="credenciamento.csv")
+            )
 
     @commands.command("loadeventbrite")
     @commands.has_permissions(manage_guild=True)
@@ -1,16 +1,25 @@
 import asyncio
-import json
-from base64 import b64encode
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from httpx import AsyncClient, HTTPError, ReadTimeout
+from httpx import AsyncClient, HTTPError
 from loguru import logger
 
+from pybr2022.http import (
+    ClientSettings,
+    ConnectionStats,
+    build_client,
+    request_with_retry,
+)
+from pybr2022.metrics import metrics
+from pybr2022.ratelimit import RetryPolicy, TokenBucket
 from .models import Attendee
 
-api_calls_limit = asyncio.Semaphore(5)
-MAX_API_CALL_RETRIES = 3
+# EventBrite allows 2000 calls per hour for each token.
+DEFAULT_RATE_LIMIT = 2000 / 3600
+DEFAULT_RATE_BURST = 100
+# Tickets with these statuses no longer give access to the event.
+INACTIVE_STATUSES = {"not attending", "deleted", "transferred"}
 
 
 class EventBriteAPIException(Exception):
@@ -20,39 +29,51 @@ class EventBriteAPIException(Exception):
 class EventBrite:
     BASE_URL = "https://www.eventbriteapi.com/v3"
 
-    def __init__(self, event_id: str, api_token: str):
+    def __init__(
+        self,
+        event_id: str,
+        api_token: str,
+        client_settings: Optional[ClientSettings] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
         self.event_id = event_id
         self.api_token = api_token
+        self._rate_limiter = rate_limiter or TokenBucket(
+            DEFAULT_RATE_LIMIT, DEFAULT_RATE_BURST
+        )
+        self._retry_policy = retry_policy or RetryPolicy()
+        self.connection_stats = ConnectionStats()
+        self._client_settings = client_settings or ClientSettings()
+        self._client: Optional[AsyncClient] = None
 
-    def _get_client(self):
-        return AsyncClient()
+    def _get_client(self) -> AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = build_client(self._client_settings, self.connection_stats)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            logger.info(f"EventBrite client closed. {self.connection_stats}")
 
     def _build_attendees_endpoint(self) -> str:
         return f"{self.BASE_URL}/events/{self.event_id}/attendees/"
 
-    async def _request(
-        self,
-        client: AsyncClient,
-        url: str,
-        params: dict,
-        retries: int = MAX_API_CALL_RETRIES,
-    ) -> dict:
-        async with api_calls_limit:
-            try:
-                response = await client.get(url, params=params, timeout=10)
-            except ReadTimeout:
-                if retries > 1:
-                    seconds = (MAX_API_CALL_RETRIES - retries + 1) * 2
-                    await asyncio.sleep(seconds)
-                    return await self._request(client, url, params, retries - 1)
-                else:
-                    raise
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                raise EventBriteAPIException(
-                    f"Error when calling EventBrite API. content={response.text!r}, url={url}, status_code={response.status_code}"
-                )
+    async def _request(self, client: AsyncClient, url: str, params: dict) -> dict:
+        with metrics.timer("upstream_request_seconds", upstream="eventbrite"):
+            response = await request_with_retry(
+                client, url, self._rate_limiter, self._retry_policy, params=params
+            )
+        metrics.inc(
+            "upstream_responses", upstream="eventbrite", status=response.status_code
+        )
+        try:
+            response.raise_for_status()
+        except HTTPError:
+            raise EventBriteAPIException(
+                f"Error when calling EventBrite API. content={response.text!r}, url={url}, status_code={response.status_code}"
+            )
         return response.json()
 
     async def _list_attendees(self, client: AsyncClient, params: dict) -> dict:
@@ -62,63 +83,124 @@ class EventBrite:
         logger.info(
             "List attendees request. attendees={attendees}, page_number={page_number}, page_count={page_count}, has_more_items={has_more_items}".format(
                 attendees=len(response["attendees"]),
-                page_number=response["pagination"]["page_number"],
-                page_count=response["pagination"]["page_count"],
+                page_number=response["pagination"].get("page_number"),
+                page_count=response["pagination"].get("page_count"),
                 has_more_items=response["pagination"]["has_more_items"],
             )
         )
         return response
 
     def _list_attendees_params(
-        self, page: Optional[int] = None, changed_since: Optional[datetime] = None
+        self,
+        continuation: Optional[str] = None,
+        changed_since: Optional[datetime] = None,
+        status: Optional[str] = "attending",
     ) -> dict:
-        params = {
-            "token": self.api_token,
-            "status": "attending",
-        }
-        if page:
-            next_page = json.dumps({"page": page})
-            next_page = b64encode(next_page.encode("utf-8")).decode("utf-8")
-            params["continuation"] = next_page
+        params = {"token": self.api_token}
+        if status:
+            params["status"] = status
+
+        if continuation:
+            params["continuation"] = continuation
 
         if changed_since:
             params["changed_since"] = changed_since.strftime("%Y-%m-%dT%H:%M:%SZ")
 
         return params
 
-    def _prepare_list_attendees_all_pages(
-        self, client: AsyncClient, first_page: int, last_page: int
-    ):
-        tasks = []
-        for page_number in range(first_page, last_page + 1):
-            params = self._list_attendees_params(page=page_number)
-            tasks.append(self._list_attendees(client, params))
+    def _next_page_params(
+        self,
+        response: dict,
+        changed_since: Optional[datetime] = None,
+        status: Optional[str] = "attending",
+    ) -> Optional[dict]:
+        pagination = response["pagination"]
+        if not pagination["has_more_items"]:
+            return None
+
+        continuation = pagination.get("continuation")
+        if not continuation:
+            raise EventBriteAPIException(
+                f"EventBrite has more attendees but returned no continuation token. pagination={pagination!r}"
+            )
+        return self._list_attendees_params(continuation, changed_since, status)
+
+    def _parse_attendees(self, response: dict) -> list[Attendee]:
+        return [
+            Attendee.from_eventbrite(attendee)
+            for attendee in response.get("attendees", [])
+        ]
+
+    @staticmethod
+    def _is_active(attendee: dict) -> bool:
+        return not (
+            attendee.get("cancelled")
+            or attendee.get("refunded")
+            or attendee.get("status", "").lower() in INACTIVE_STATUSES
+        )
 
-        return tasks
+    def _parse_changes(self, response: dict) -> tuple[list[Attendee], list[Attendee]]:
+        active, inactive = [], []
+        for data in response.get("attendees", []):
+            attendee = Attendee.from_eventbrite(data)
+            (active if self._is_active(data) else inactive).append(attendee)
+        return active, inactive
+
+    async def _iter_pages(
+        self, changed_since: Optional[datetime], status: Optional[str]
+    ) -> AsyncIterator[dict]:
+        """Yield each page as soon as it arrives.
+
+        Pages are chained by the continuation token returned by EventBrite,
+        so they are fetched in order; the next page is requested while the
+        current one is being consumed.
+        """
+        client = self._get_client()
+        params = self._list_attendees_params(changed_since=changed_since, status=status)
+        response = await self._list_attendees(client, params)
+        next_page = None
+        try:
+            while True:
+                params = self._next_page_params(response, changed_since, status)
+                if params:
+                    next_page = asyncio.ensure_future(
+                        self._list_attendees(client, params)
+                    )
+
+                yield response
+
+                if not next_page:
+                    break
+                response, next_page = await next_page, None
+        finally:
+            if next_page:
+                next_page.cancel()
+
+        logger.info(f"EventBrite connections. {self.connection_stats}")
+
+    async def iter_attendees(
+        self, changed_since: Optional[datetime] = None
+    ) -> AsyncIterator[list[Attendee]]:
+        """Yield the attending attendees of each page."""
+        async for response in self._iter_pages(changed_since, "attending"):
+            yield self._parse_attendees(response)
 
-    async def _list_all_attendees(
-        self, client: AsyncClient, next_page: int, last_page: int
-    ) -> list[Attendee]:
-        tasks = self._prepare_list_attendees_all_pages(client, next_page, last_page)
+    async def iter_changes(
+        self, changed_since: Optional[datetime] = None
+    ) -> AsyncIterator[tuple[list[Attendee], list[Attendee]]]:
+        """Yield the attendees changed since ``changed_since``, of any status.
 
-        logger.info(
-            f"Tasks created for remaining pages of attendees list. tasks={len(tasks)}"
-        )
-        results = await asyncio.gather(*tasks)
-        return [attendees for result in results for attendees in result["attendees"]]
+        Each page is split into the tickets still valid and the ones
+        cancelled, refunded or transferred since.
+        """
+        async for response in self._iter_pages(changed_since, None):
+            yield self._parse_changes(response)
 
     async def list_attendees(
         self, changed_since: Optional[datetime] = None
     ) -> list[Attendee]:
-        async with self._get_client() as client:
-            params = self._list_attendees_params(changed_since=changed_since)
-            response = await self._list_attendees(client, params)
-            attendees = response.get("attendees", [])
-
-            if response["pagination"]["has_more_items"]:
-                next_page = response["pagination"]["page_number"] + 1
-                last_page = response["pagination"]["page_count"]
-                attendees.extend(
-                    await self._list_all_attendees(client, next_page, last_page)
-                )
-            return [Attendee.from_eventbrite(attendee) for attendee in attendees]
+        return [
+            attendee
+            async for attendees in self.iter_attendees(changed_since)
+            for attendee in attendees
+        ]
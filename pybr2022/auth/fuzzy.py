@@ -0,0 +1,191 @@
+from collections import Counter
+from typing import Iterable
+
+# Typos seen in failed authentications, the rest is caught by edit distance
+# against the domains already in the index.
+DOMAIN_TYPOS = {
+    "gmial.com": "gmail.com",
+    "gmai.com": "gmail.com",
+    "gamil.com": "gmail.com",
+    "gmail.com.br": "gmail.com",
+    "gmail.co": "gmail.com",
+    "hotmal.com": "hotmail.com",
+    "hotmial.com": "hotmail.com",
+    "hotmail.con": "hotmail.com",
+    "outlok.com": "outlook.com",
+    "yahoo.com.b": "yahoo.com.br",
+}
+# Providers that ignore dots and "+tags" in the local part.
+DOTLESS_DOMAINS = {"gmail.com", "googlemail.com"}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up with ``limit + 1`` once it's above it.
+
+    Only the diagonal band of width ``limit`` is computed, anything outside
+    of it is already over the limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost if cost < over else over
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return over
+        previous = current
+    return previous[-1]
+
+
+def trigrams(text: str) -> set[str]:
+    text = f"^{text}$"
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class FuzzyEmailIndex:
+    """Find emails close to a mistyped one.
+
+    Emails are indexed by normalized form (known domain typos fixed, dots and
+    "+tags" dropped where the provider ignores them) and by trigrams. Trigrams
+    shared by more than ``max_postings`` emails, like ``com``, are too common
+    to narrow anything down and stop being indexed. Queries only scan the
+    rarest trigrams, so lookups stay well under a millisecond.
+    """
+
+    def __init__(
+        self,
+        max_postings: int = 500,
+        max_distance: int = 2,
+        scanned_trigrams: int = 8,
+    ):
+        self._max_postings = max_postings
+        self._max_distance = max_distance
+        self._scanned_trigrams = scanned_trigrams
+        self._emails: set[str] = set()
+        self._domains: Counter[str] = Counter()
+        self._normalized: dict[str, set[str]] = {}
+        self._postings: dict[str, list[str]] = {}
+        self._common: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    def __contains__(self, email: str) -> bool:
+        return email in self._emails
+
+    def _fix_domain(self, domain: str) -> str:
+        domain = DOMAIN_TYPOS.get(domain, domain)
+        if domain in self._domains:
+            return domain
+
+        closest = min(
+            (
+                (edit_distance(domain, known, 2), -count, known)
+                for known, count in self._domains.most_common(50)
+            ),
+            default=None,
+        )
+        if closest and closest[0] <= 2:
+            return closest[2]
+        return domain
+
+    def normalize(self, email: str, fix_domain: bool = False) -> str:
+        local, _, domain = email.strip().lower().rpartition("@")
+        if fix_domain:
+            domain = self._fix_domain(domain)
+        if domain in DOTLESS_DOMAINS:
+            local = local.split("+", 1)[0].replace(".", "")
+        return f"{local}@{domain}"
+
+    def add(self, email: str):
+        if email in self._emails:
+            return
+
+        self._emails.add(email)
+        self._domains[email.rpartition("@")[2]] += 1
+        self._normalized.setdefault(self.normalize(email), set()).add(email)
+        for trigram in trigrams(email):
+            if trigram in self._common:
+                continue
+            postings = self._postings.setdefault(trigram, [])
+            postings.append(email)
+            if len(postings) > self._max_postings:
+                del self._postings[trigram]
+                self._common.add(trigram)
+
+    def update(self, emails: Iterable[str]) -> int:
+        """Add the emails not indexed yet and return how many were added."""
+        new_emails = set(emails) - self._emails
+        for email in new_emails:
+            self.add(email)
+        return len(new_emails)
+
+    def discard(self, email: str):
+        if email not in self._emails:
+            return
+
+        self._emails.remove(email)
+        domain = email.rpartition("@")[2]
+        self._domains[domain] -= 1
+        if not self._domains[domain]:
+            del self._domains[domain]
+        normalized = self.normalize(email)
+        self._normalized[normalized].discard(email)
+        if not self._normalized[normalized]:
+            del self._normalized[normalized]
+        for trigram in trigrams(email):
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                postings.remove(email)
+
+    def sync(self, emails: Iterable[str]) -> tuple[int, int]:
+        """Index exactly ``emails``, returning how many were added and removed."""
+        emails = set(emails)
+        removed = self._emails - emails
+        for email in removed:
+            self.discard(email)
+        return self.update(emails), len(removed)
+
+    def _candidates(self, query: str) -> Counter[str]:
+        postings = sorted(
+            (
+                self._postings[trigram]
+                for trigram in trigrams(query)
+                if trigram in self._postings
+            ),
+            key=len,
+        )
+        candidates: Counter[str] = Counter()
+        for emails in postings[: self._scanned_trigrams]:
+            candidates.update(emails)
+        return candidates
+
+    def suggest(self, query: str, limit: int = 3) -> list[str]:
+        """Indexed emails close to ``query``, the closest first."""
+        query = query.strip().lower()
+        normalized = self.normalize(query, fix_domain=True)
+        exact = sorted(self._normalized.get(normalized, set()) - {query})
+
+        scored = []
+        for email, _ in self._candidates(query).most_common(limit * 10):
+            if email == query or email in exact:
+                continue
+            distance = edit_distance(query, email, self._max_distance)
+            if distance <= self._max_distance:
+                scored.append((distance, email))
+
+        return (exact + [email for _, email in sorted(scored)])[:limit]
@@ -1,62 +1,626 @@
+import asyncio
 import json
+import os
+import re
+import resource
+import time
+from contextlib import contextmanager
+from dataclasses import replace
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional
+from tempfile import NamedTemporaryFile
+from typing import Any, Iterable, KeysView, Optional, TextIO, Union
 
 from loguru import logger
 
 from .models import Attendee
 
 
+# An index entry: the attendee, or just its id in membership only mode.
+# ``None`` for entries stored before attendee ids were kept.
+Entry = Union[Attendee, str, None]
+
+_MISSING = object()
+
+
 class AttendeesJSONEncoder(json.JSONEncoder):
     def default(self, obj: Any):
         if isinstance(obj, Attendee):
-            return obj.__dict__
+            return obj.to_cache()
+
+
+class _SnapshotReader:
+    """Incremental parser for the cache snapshot.
+
+    Reads the file in chunks and yields ``("index", email, entry)`` for every
+    attendee, ``("ids", attendee_id, email)`` for every ticket and
+    ``("meta", key, value)`` for the other top level keys, so the whole
+    document never has to be in memory at once.
+    """
+
+    _decoder = json.JSONDecoder()
+    _whitespace = re.compile(r"\s*")
+
+    def __init__(self, fp: TextIO, chunk_size: int):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+
+        chunk = self._fp.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = self._whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of attendees cache")
+
+    def _expect(self, tokens: str) -> str:
+        token = self._peek()
+        if token not in tokens:
+            raise ValueError(
+                f"Unexpected token in attendees cache. token={token!r}, expected={tokens!r}"
+            )
+        self._pos += 1
+        return token
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+
+            # A number can be cut at the end of the buffer and still parse.
+            if end == len(self._buffer) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def _members(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+
+        while True:
+            key = self._value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def __iter__(self):
+        for key in self._members():
+            if key in ("index", "ids"):
+                for member_key in self._members():
+                    yield key, member_key, self._value()
+            else:
+                yield "meta", key, self._value()
 
 
 class AttendeesIndex:
-    def __init__(self, index_path: Path, cache_enabled: bool = False):
+    def __init__(
+        self,
+        index_path: Path,
+        cache_enabled: bool = False,
+        flush_delay: float = 5.0,
+        journal_enabled: bool = False,
+        compact_threshold: int = 4 * 1024 * 1024,
+        lazy_load: bool = False,
+        load_chunk_size: int = 64 * 1024,
+        load_batch_size: int = 1000,
+        membership_only: bool = False,
+    ):
         self._index_path = index_path
+        self._journal_path = index_path.with_name(f"{index_path.name}.journal")
         self._cache_enabled = cache_enabled
-        self._index, self.updated_at = self._load_cache()
+        self._journal_enabled = journal_enabled
+        self._compact_threshold = compact_threshold
+        self._journal_size = 0
+        self._journal_pending: list[dict] = []
+        self._membership_only = membership_only
+        self._flush_delay = flush_delay
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._transaction_depth = 0
+        self._dirty = False
+        self._load_chunk_size = load_chunk_size
+        self._load_batch_size = load_batch_size
+        self._load_task: Optional[asyncio.Task] = None
+        self._loaded = asyncio.Event()
+        self._index: dict[str, Entry] = {}
+        # EventBrite changes come keyed by attendee id, this maps each one
+        # to its email in ``_index``.
+        self._ids: dict[str, str] = {}
+        # Emails used by more than one ticket and their attendee ids; the
+        # email stays valid until the last one is cancelled.
+        self._shared: dict[str, set[str]] = {}
+        self.updated_at: Optional[datetime] = None
+        # Bumped on every change so callers can tell their derived data
+        # (e.g. cached lookups) is stale.
+        self.version = 0
+        if not lazy_load:
+            self._load_cache()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    async def wait_loaded(self) -> None:
+        await self._loaded.wait()
 
     def _load_cache(self):
-        if not all(
-            [
-                self._cache_enabled,
-                self._index_path.exists(),
-                self._index_path.is_file(),
-            ]
-        ):
-            return {}, None
+        for _ in self._iter_load():
+            pass
+
+    async def load(self) -> None:
+        """Load the cache, yielding to the event loop between batches.
+
+        Lookups can be answered while the index fills up; ``updated_at`` is
+        only set once the last record was read.
+        """
+        for _ in self._iter_load():
+            await asyncio.sleep(0)
 
+    def start_loading(self) -> asyncio.Task:
+        self._load_task = asyncio.create_task(self.load())
+        return self._load_task
+
+    def _iter_load(self):
+        if not self._cache_enabled:
+            self._loaded.set()
+            return
+
+        started_at = time.perf_counter()
+        try:
+            updated_at = yield from self._load_snapshot()
+            if self._journal_enabled:
+                updated_at = yield from self._replay_journal(updated_at)
+        except Exception:
+            # Start empty, without ``updated_at`` the next sync pulls every
+            # attendee again.
+            logger.exception(
+                f"Error while loading attendees cache, starting empty. path={self._index_path}"
+            )
+            self._index.clear()
+            self._ids.clear()
+            self._shared.clear()
+            updated_at = None
+            # Replace the unreadable files with a snapshot on the next write.
+            self._journal_size = self._compact_threshold
+        finally:
+            # Nothing waiting on the index may hang, whatever happened.
+            self._loaded.set()
+
+        self.updated_at = updated_at
+        self.version += 1
+        logger.info(
+            "Attendees cache loaded. size={size}, seconds={seconds:.3f}, peak_rss_mb={rss:.1f}".format(
+                size=len(self._index),
+                seconds=time.perf_counter() - started_at,
+                rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            )
+        )
+
+    def _load_snapshot(self):
+        if not (self._index_path.exists() and self._index_path.is_file()):
+            return None
+
+        updated_at = None
         with self._index_path.open() as fp:
-            cache = json.load(fp)
-            updated_at = datetime.fromisoformat(cache["updated_at"])
-            index = {
-                key: Attendee.from_cache(value) for key, value in cache["index"].items()
-            }
-            return index, updated_at
+            reader = _SnapshotReader(fp, self._load_chunk_size)
+            for count, (section, key, value) in enumerate(reader, 1):
+                if section == "index":
+                    self._store(key, self._from_cache(key, value))
+                elif section == "ids":
+                    self._link(key, value)
+                elif key == "updated_at":
+                    updated_at = datetime.fromisoformat(value)
+
+                if not count % self._load_batch_size:
+                    yield
+
+        return updated_at
+
+    def _replay_journal(self, updated_at: Optional[datetime]):
+        if not self._journal_path.is_file():
+            return updated_at
+
+        entries = 0
+        with self._journal_path.open("rb+") as fp:
+            offset = 0
+            for line in fp:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("Missing line terminator")
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash in the middle of an append leaves a torn
+                    # last line; drop it so new entries start clean.
+                    logger.warning(
+                        f"Discarding torn attendees journal tail. path={self._journal_path}, offset={offset}"
+                    )
+                    fp.truncate(offset)
+                    break
+
+                email = entry["email"]
+                if entry.get("deleted"):
+                    self._discard(entry["id"], email)
+                else:
+                    self._store(email, self._from_cache(email, entry["attendee"]))
+                updated_at = datetime.fromisoformat(entry["updated_at"])
+                offset += len(line)
+                entries += 1
+                if not entries % self._load_batch_size:
+                    yield
+
+        self._journal_size = offset
+        logger.info(
+            f"Attendees journal replayed. entries={entries}, path={self._journal_path}"
+        )
+        return updated_at
+
+    def _dump_cache(self) -> dict:
+        # Shallow copy, so the index can keep changing while the
+        # snapshot is serialized in a worker thread.
+        return {
+            "updated_at": self.updated_at.isoformat(),
+            "index": dict(self._index),
+            # Only the owner of an email shared by several tickets is in
+            # the index entries, this keeps the others.
+            "ids": dict(self._ids),
+        }
+
+    def _write_cache(self, cache: dict):
+        tmp_file = NamedTemporaryFile(
+            mode="w",
+            dir=self._index_path.parent,
+            prefix=f".{self._index_path.name}.",
+            suffix=".tmp",
+            delete=False,
+        )
+        try:
+            with tmp_file as fp:
+                json.dump(cache, fp, cls=AttendeesJSONEncoder)
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(tmp_file.name, self._index_path)
+        except BaseException:
+            Path(tmp_file.name).unlink(missing_ok=True)
+            raise
+
+    def _write_journal(self, entries: list[dict], updated_at: datetime) -> int:
+        updated_at = updated_at.isoformat()
+        lines = "".join(
+            json.dumps({"updated_at": updated_at, **entry}, cls=AttendeesJSONEncoder)
+            + "\n"
+            for entry in entries
+        )
+        with self._journal_path.open("a") as fp:
+            fp.write(lines)
+            fp.flush()
+            os.fsync(fp.fileno())
+            return fp.tell()
+
+    def _persist(
+        self,
+        snapshot: Optional[dict],
+        journal: list[dict],
+        updated_at: datetime,
+    ) -> int:
+        if snapshot is not None:
+            self._write_cache(snapshot)
+            # Everything in the journal is in the new snapshot now.
+            self._journal_path.unlink(missing_ok=True)
+            return 0
+
+        return self._write_journal(journal, updated_at)
+
+    def _prepare_persist(self):
+        self._dirty = False
+        journal, self._journal_pending = self._journal_pending, []
+        if self._journal_enabled and self._journal_size < self._compact_threshold:
+            return None, journal, self.updated_at
+
+        return self._dump_cache(), [], self.updated_at
 
     def _store_cache(self):
         if not self._cache_enabled:
+            self._dirty = False
+            self._journal_pending = []
             return
 
-        with self._index_path.open(mode="w") as fp:
-            cache = {
-                "updated_at": self.updated_at.isoformat(),
-                "index": self._index,
-            }
-            json.dump(cache, fp, cls=AttendeesJSONEncoder)
+        self._journal_size = self._persist(*self._prepare_persist())
 
-    def add(self, attendee: Attendee) -> None:
-        self._index[attendee.email.lower()] = attendee
+    def _schedule_store(self):
+        if not self._cache_enabled:
+            self._dirty = False
+            self._journal_pending = []
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._store_cache()
+            return
+
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._flush_delay, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        self._flush_task = asyncio.create_task(self._flush())
+
+    def _changed(self):
         self.updated_at = datetime.utcnow()
-        self._store_cache()
+        self.version += 1
+        self._dirty = True
+        if not self._transaction_depth:
+            self._schedule_store()
+
+    def _from_cache(self, key: str, data: Union[dict, str, None]) -> Entry:
+        if data is None or isinstance(data, str):
+            return data
+        if self._membership_only:
+            return data.get("id")
+        if data["email"] == key:
+            # Share one string between the key and the record.
+            data["email"] = key
+        return Attendee.from_cache(data)
+
+    @staticmethod
+    def _owner(entry: Entry) -> Optional[str]:
+        return entry.id if isinstance(entry, Attendee) else entry
+
+    def _store(self, email: str, entry: Entry):
+        attendee_id = self._owner(entry)
+        if attendee_id is not None:
+            previous_email = self._ids.get(attendee_id)
+            if previous_email is not None and previous_email != email:
+                # The email of the ticket changed, the old one is no longer
+                # valid unless another ticket uses it.
+                self._unlink(attendee_id, previous_email)
+            self._ids[attendee_id] = email
+
+            owner = self._owner(self._index.get(email))
+            if owner is not None and owner != attendee_id:
+                self._shared.setdefault(email, {owner}).add(attendee_id)
+
+        self._index[email] = entry
+
+    def _link(self, attendee_id: str, email: str):
+        owner = self._owner(self._index.get(email))
+        if owner is None:
+            return
+
+        self._ids[attendee_id] = email
+        if owner != attendee_id:
+            self._shared.setdefault(email, {owner}).add(attendee_id)
+
+    def _unlink(self, attendee_id: str, email: str):
+        if self._ids.get(attendee_id) == email:
+            del self._ids[attendee_id]
+
+        owners = self._shared.get(email)
+        if owners is None:
+            self._index.pop(email, None)
+            return
+
+        owners.discard(attendee_id)
+        if len(owners) < 2:
+            del self._shared[email]
+        entry = self._index[email]
+        if self._owner(entry) == attendee_id:
+            owner = next(iter(owners))
+            self._index[email] = (
+                replace(entry, id=owner) if isinstance(entry, Attendee) else owner
+            )
+
+    def _discard(self, attendee_id: Optional[str], email: str):
+        if attendee_id is None:
+            self._index.pop(email, None)
+        else:
+            self._unlink(attendee_id, email)
+
+    def _put(self, attendee: Attendee) -> bool:
+        email = attendee.email.lower()
+        if email == attendee.email:
+            # Share one string between the key and the record.
+            email = attendee.email
+        entry = attendee.id if self._membership_only else attendee
+        current = self._index.get(email, _MISSING)
+        if current == entry:
+            return False
+        if (
+            attendee.id is not None
+            and self._ids.get(attendee.id) == email
+            and self._owner(current) != attendee.id
+        ):
+            # Another ticket with the same email holds the entry.
+            return False
+
+        self._store(email, entry)
+        if self._journal_enabled:
+            self._journal_pending.append({"email": email, "attendee": entry})
+        return True
+
+    def _remove(self, attendee_id: Optional[str], email: str):
+        self._discard(attendee_id, email)
+        if self._journal_enabled:
+            self._journal_pending.append(
+                {"email": email, "id": attendee_id, "deleted": True}
+            )
+
+    async def flush(self) -> None:
+        """Write pending changes to the cache file without blocking the loop.
+
+        In journal mode the pending attendees are appended to the journal,
+        and once it grows past the compaction threshold the whole index is
+        written as a new snapshot instead.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        # Let a debounced flush already writing finish before returning.
+        task, self._flush_task = self._flush_task, None
+        if task is not None:
+            await task
+        await self._flush()
+
+    async def _flush(self):
+        async with self._flush_lock:
+            if not self._dirty or not self._cache_enabled:
+                return
+
+            snapshot, journal, updated_at = self._prepare_persist()
+            try:
+                self._journal_size = await asyncio.to_thread(
+                    self._persist, snapshot, journal, updated_at
+                )
+            except Exception:
+                self._dirty = True
+                self._journal_pending = journal + self._journal_pending
+                logger.exception(
+                    f"Error while storing attendees cache. path={self._index_path}"
+                )
+                return
+
+        if snapshot is not None:
+            logger.info(
+                f"Attendees cache stored. size={len(self._index)}, updated_at={self.updated_at!r}"
+            )
+        else:
+            logger.info(
+                f"Attendees journal appended. entries={len(journal)}, journal_size={self._journal_size}"
+            )
+
+    @contextmanager
+    def transaction(self):
+        """Group several changes so they are persisted with a single write."""
+        self._transaction_depth += 1
+        try:
+            yield self
+        finally:
+            self._transaction_depth -= 1
+            if not self._transaction_depth and self._dirty:
+                self._schedule_store()
+
+    def add(self, attendee: Attendee) -> None:
+        if not self._put(attendee):
+            return
+
+        self._changed()
         logger.info(
             f"New attendee added to the index. attendee={attendee!r}, updated_at={self.updated_at!r}"
         )
 
+    def add_many(self, attendees: Iterable[Attendee]) -> int:
+        """Add or update the attendees, returning how many were given.
+
+        Attendees already in the index as they are don't count as a change,
+        so pulling the same ones again neither writes nor bumps ``version``.
+        """
+        count = changed = 0
+        with self.transaction():
+            for attendee in attendees:
+                changed += self._put(attendee)
+                count += 1
+
+            if changed:
+                self._changed()
+
+        logger.info(
+            f"New attendees added to the index. attendees={count}, changed={changed}, updated_at={self.updated_at!r}"
+        )
+        return count
+
+    def remove_many(self, attendee_ids: Iterable[str]) -> int:
+        """Remove cancelled tickets by attendee id, returning how many were in.
+
+        The email stays in the index while another ticket still uses it.
+        """
+        removed = 0
+        with self.transaction():
+            for attendee_id in attendee_ids:
+                email = self._ids.get(attendee_id)
+                if email is not None:
+                    self._remove(attendee_id, email)
+                    removed += 1
+
+            if removed:
+                self._changed()
+
+        logger.info(
+            f"Attendees removed from the index. attendees={removed}, updated_at={self.updated_at!r}"
+        )
+        return removed
+
+    def retain(self, attendee_ids: set[str]) -> int:
+        """Remove the attendees missing from a full pull of ``attendee_ids``.
+
+        Entries stored without an attendee id can't be matched against the
+        pull, so they are removed too; the pull already added them back with
+        their id if they are still valid.
+        """
+        stale = [
+            (attendee_id, email)
+            for attendee_id, email in self._ids.items()
+            if attendee_id not in attendee_ids
+        ]
+        orphans = [
+            email for email, entry in self._index.items() if self._owner(entry) is None
+        ]
+        with self.transaction():
+            for attendee_id, email in stale:
+                self._remove(attendee_id, email)
+            for email in orphans:
+                self._remove(None, email)
+
+            if stale or orphans:
+                self._changed()
+
+        logger.info(
+            f"Attendees missing from EventBrite removed. attendees={len(stale)}, without_id={len(orphans)}"
+        )
+        return len(stale) + len(orphans)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, query: str) -> bool:
+        return query.strip().lower() in self._index
+
+    def keys(self) -> KeysView[str]:
+        """The lowercase emails in the index, as a set-like view."""
+        return self._index.keys()
+
     def search(self, query: str) -> Optional[Attendee]:
-        query = query.strip().lower()
-        return self._index.get(query)
+        """Return the attendee registered with the email in ``query``.
+
+        In membership only mode just emails and attendee ids are kept, so
+        this always returns ``None``; use ``query in index`` to check an
+        email instead.
+        """
+        entry = self._index.get(query.strip().lower())
+        return entry if isinstance(entry, Attendee) else None
@@ -0,0 +1,108 @@
+import asyncio
+import io
+import time
+from typing import Awaitable, Callable
+
+import discord
+from loguru import logger
+
+# Discord refuses messages longer than this, bigger batches go as a file.
+MESSAGE_MAX_LENGTH = 2000
+BUSY_POLL_INTERVAL = 1.0
+
+
+class BatchedLogSink:
+    """Buffer log records and post them to a channel in batches.
+
+    Records are flushed every ``flush_interval`` seconds, or sooner once
+    ``max_records`` are waiting. While ``busy()`` is true the flush is held
+    back, for at most ``max_defer`` seconds, so user facing requests get the
+    rate limit budget first.
+    """
+
+    def __init__(
+        self,
+        get_channel: Callable[[], Awaitable[discord.abc.Messageable]],
+        flush_interval: float = 5.0,
+        max_records: int = 20,
+        busy: Callable[[], bool] = lambda: False,
+        max_defer: float = 60.0,
+        max_buffer: int = 1000,
+    ):
+        self._get_channel = get_channel
+        self._flush_interval = flush_interval
+        self._max_records = max_records
+        self._busy = busy
+        self._max_defer = max_defer
+        self._max_buffer = max_buffer
+        self._records: list[str] = []
+        self._full = asyncio.Event()
+        self._task = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _trim(self):
+        # Keep the newest records while flushes are held back or failing.
+        dropped = len(self._records) - self._max_buffer
+        if dropped > 0:
+            del self._records[:dropped]
+            logger.warning(f"Log records dropped. records={dropped}")
+
+    def add(self, record: str):
+        self._records.append(record)
+        self._trim()
+        if len(self._records) >= self._max_records:
+            self._full.set()
+
+    def _requeue(self, records: list[str]):
+        self._records[:0] = records
+        self._trim()
+
+    async def _send(self, records: list[str]):
+        channel = await self._get_channel()
+        content = "\n\n".join(records)
+        if len(content) <= MESSAGE_MAX_LENGTH:
+            await channel.send(content)
+            return
+
+        await channel.send(
+            f"⚠️ {len(records)} registros, detalhes no anexo.",
+            file=discord.File(io.BytesIO(content.encode()), filename="logs.md"),
+        )
+
+    async def flush(self) -> int:
+        records, self._records = self._records, []
+        self._full.clear()
+        if not records:
+            return 0
+
+        try:
+            await self._send(records)
+        except Exception:
+            logger.exception(f"Error while sending log records. records={len(records)}")
+            self._requeue(records)
+            return 0
+        return len(records)
+
+    async def _wait_idle(self):
+        deadline = time.monotonic() + self._max_defer
+        while self._busy() and time.monotonic() < deadline:
+            await asyncio.sleep(BUSY_POLL_INTERVAL)
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._records:
+                await self._wait_idle()
+                await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
@@ -0,0 +1,75 @@
+import csv
+import io
+from typing import IO, Iterable, Iterator, Optional
+
+import discord
+
+CSV_HEADER = ("id", "name", "display_name", "joined_at")
+
+
+class MemberTracker:
+    """Ids of the guild members still waiting for authentication.
+
+    The set is filled once from the guild and then kept current by the
+    member join, remove and update events, so counting is O(1).
+    """
+
+    def __init__(self):
+        self._pending: set[int] = set()
+        self.ready = False
+
+    @staticmethod
+    def needs_auth(member: discord.Member) -> bool:
+        # Everyone has the @everyone role, authenticated members have more.
+        return len(member.roles) == 1
+
+    def update(self, member: discord.Member):
+        if self.needs_auth(member):
+            self._pending.add(member.id)
+        else:
+            self._pending.discard(member.id)
+
+    def remove(self, member: discord.Member):
+        self._pending.discard(member.id)
+
+    def reset(self):
+        self._pending.clear()
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self._pending
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._pending)
+
+
+def _member_row(member_id: int, member: Optional[discord.Member]) -> tuple:
+    if member is None:
+        return (member_id, "", "", "")
+    joined_at = member.joined_at.isoformat() if member.joined_at else ""
+    return (member_id, str(member), member.display_name, joined_at)
+
+
+def write_members_csv(
+    member_ids: Iterable[int], guild: Optional[discord.Guild], fp: IO[bytes]
+) -> int:
+    """Write one row per member to ``fp`` and return the number of rows.
+
+    Rows are written as they are resolved from the gateway cache, so the
+    members are never held in memory all at once.
+    """
+    text = io.TextIOWrapper(fp, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(CSV_HEADER)
+    rows = 0
+    for member_id in member_ids:
+        member = guild.get_member(member_id) if guild else None
+        writer.writerow(_member_row(member_id, member))
+        rows += 1
+
+    text.flush()
+    text.detach()
+    return rows
@@ -1,12 +1,17 @@
+import sys
 from dataclasses import dataclass
+from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Attendee:
     order_id: str
     first_name: str
     last_name: str
     email: str
+    # EventBrite attendee id, unique per ticket while one order can hold
+    # several. Records cached before it was stored don't have one.
+    id: Optional[str] = None
 
     @staticmethod
     def from_eventbrite(data: dict):
@@ -14,9 +19,21 @@ class Attendee:
 
     @staticmethod
     def from_cache(data: dict):
+        # Names repeat a lot across attendees, interning them shares a
+        # single string object between all the records that use it.
         return Attendee(
             order_id=data["order_id"],
-            first_name=data["first_name"],
-            last_name=data["last_name"],
+            first_name=sys.intern(data["first_name"]),
+            last_name=sys.intern(data["last_name"]),
             email=data["email"],
+            id=data.get("id"),
         )
+
+    def to_cache(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "email": self.email,
+            "id": self.id,
+        }
@@ -0,0 +1,48 @@
+from typing import KeysView
+
+
+class PendingVerifications:
+    """Failed authentication attempts kept for a later EventBrite sync.
+
+    Each user keeps only the last email tried. When full, the oldest
+    attempts are dropped first.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self._max_entries = max_entries
+        self._by_user: dict[int, str] = {}
+        self._by_email: dict[str, set[int]] = {}
+
+    def record(self, user_id: int, email: str):
+        self.discard(user_id)
+        self._by_user[user_id] = email
+        self._by_email.setdefault(email, set()).add(user_id)
+        while len(self._by_user) > self._max_entries:
+            self.discard(next(iter(self._by_user)))
+
+    def discard(self, user_id: int):
+        email = self._by_user.pop(user_id, None)
+        if email is None:
+            return
+
+        user_ids = self._by_email[email]
+        user_ids.discard(user_id)
+        if not user_ids:
+            del self._by_email[email]
+
+    def match(self, emails: KeysView[str]) -> dict[int, str]:
+        """Pop and return the attempts whose email is now in ``emails``."""
+        matches = {}
+        for email in self._by_email.keys() & emails:
+            for user_id in self._by_email[email]:
+                matches[user_id] = email
+
+        for user_id in matches:
+            self.discard(user_id)
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._by_user)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._by_user
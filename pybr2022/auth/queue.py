@@ -0,0 +1,128 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from loguru import logger
+
+from pybr2022.metrics import metrics
+
+QUEUE_WAIT = metrics.histogram("auth_queue_wait_seconds")
+
+Handler = Callable[[Any], Awaitable[None]]
+# Whether a newer item should take the place of the one already queued.
+Replaces = Callable[[Any, Any], bool]
+
+
+@dataclass
+class QueueStats:
+    submitted: int = 0
+    deduplicated: int = 0
+    rejected: int = 0
+    processed: int = 0
+    failed: int = 0
+    max_depth: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"submitted={self.submitted}, deduplicated={self.deduplicated}, "
+            f"rejected={self.rejected}, processed={self.processed}, "
+            f"failed={self.failed}, max_depth={self.max_depth}"
+        )
+
+
+class AuthQueue:
+    """Run authentication requests on a fixed number of workers.
+
+    Requests are keyed by user: while a user is waiting in the queue, a newer
+    message takes the place of the queued one when ``replaces(queued, new)``
+    says so and is dropped otherwise, and a user is never handled by two
+    workers at once. Once ``max_size`` users are waiting, ``submit`` refuses
+    new ones so callers can ask them to retry later.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        workers: int = 8,
+        max_size: int = 5000,
+        replaces: Replaces = lambda queued, new: True,
+    ):
+        self._handler = handler
+        self._replaces = replaces
+        self._workers = workers
+        self._max_size = max_size
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        # user id -> (latest item, when the user started waiting)
+        self._pending: dict[int, tuple[Any, float]] = {}
+        self._active: set[int] = set()
+        self._tasks: list[asyncio.Task] = []
+        self.stats = QueueStats()
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def submit(self, user_id: int, item: Any) -> bool:
+        if user_id in self._pending:
+            queued, submitted_at = self._pending[user_id]
+            if self._replaces(queued, item):
+                self._pending[user_id] = (item, submitted_at)
+            self.stats.deduplicated += 1
+            return True
+
+        if len(self._pending) >= self._max_size:
+            self.stats.rejected += 1
+            logger.warning(
+                f"Auth queue full, request rejected. user_id={user_id}, depth={self.depth}"
+            )
+            return False
+
+        self._pending[user_id] = (item, time.perf_counter())
+        self.stats.submitted += 1
+        self.stats.max_depth = max(self.stats.max_depth, self.depth)
+        # Users being handled are queued again when their worker is done.
+        if user_id not in self._active:
+            self._queue.put_nowait(user_id)
+        return True
+
+    async def _handle(self, user_id: int):
+        item, submitted_at = self._pending.pop(user_id)
+        QUEUE_WAIT.record(time.perf_counter() - submitted_at)
+        self._active.add(user_id)
+        try:
+            await self._handler(item)
+            self.stats.processed += 1
+        except Exception:
+            self.stats.failed += 1
+            logger.exception(f"Error while handling auth request. user_id={user_id}")
+        finally:
+            self._active.discard(user_id)
+            if user_id in self._pending:
+                self._queue.put_nowait(user_id)
+
+    async def _work(self):
+        while True:
+            user_id = await self._queue.get()
+            try:
+                await self._handle(user_id)
+            finally:
+                self._queue.task_done()
+
+    async def join(self):
+        await self._queue.join()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self._workers)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def __str__(self) -> str:
+        return f"depth={self.depth}, active={self.active}, {self.stats}"
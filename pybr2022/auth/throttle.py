@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class UserRateLimiter:
+    """A token bucket per user, the least recently seen are dropped first.
+
+    Only ``(tokens, updated_at)`` is kept per user, a full ``TokenBucket``
+    with its lock and semaphore would be thousands of idle objects.
+    """
+
+    def __init__(self, rate: float, capacity: int, max_users: int = 10_000):
+        self.rate = rate
+        self.capacity = capacity
+        self._max_users = max_users
+        self._buckets: OrderedDict[int, tuple[float, float]] = OrderedDict()
+
+    def try_acquire(self, user_id: int) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            tokens, updated_at = bucket
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+            self._buckets.move_to_end(user_id)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[user_id] = (tokens, now)
+        while len(self._buckets) > self._max_users:
+            self._buckets.popitem(last=False)
+        return allowed
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class NegativeCache:
+    """Lookups known to fail, valid for ``ttl`` seconds.
+
+    Entries are tied to a data version: the whole cache is dropped as soon
+    as the version changes, e.g. when the attendees index gets new data.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 10_000):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: OrderedDict[Hashable, float] = OrderedDict()
+        self._version: Optional[int] = None
+        self.hits = 0
+
+    def _check_version(self, version: int):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def add(self, key: Hashable, version: int):
+        self._check_version(version)
+        self._entries[key] = time.monotonic() + self._ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def hit(self, key: Hashable, version: int) -> bool:
+        self._check_version(version)
+        expires_at = self._entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False
+        self.hits += 1
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,6 +1,38 @@
+import discord
+from discord import Intents
 from discord.ext import commands
 
 
+def build_intents() -> Intents:
+    """Only the gateway events the cogs listen to.
+
+    ``members`` feeds the member cache and join/update/remove events,
+    ``guilds`` the channel and role caches, the message intents the commands
+    and the DM authentication. Presences and typing, the noisiest events on
+    a busy server, are left out.
+    """
+    intents = Intents.none()
+    intents.guilds = True
+    intents.members = True
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+    return intents
+
+
+def is_private_message(message: discord.Message) -> bool:
+    return (
+        not message.author.bot and message.channel.type == discord.ChannelType.private
+    )
+
+
 class Bot(commands.Bot):
     async def setup_hook(self) -> None:
         await self.load_extension("setup")
+
+    def dispatch(self, event_name: str, /, *args, **kwargs) -> None:
+        super().dispatch(event_name, *args, **kwargs)
+        # Guild chat is by far the busiest event, listeners interested only in
+        # DMs get their own event so no task is scheduled for the rest.
+        if event_name == "message" and is_private_message(args[0]):
+            super().dispatch("private_message", *args, **kwargs)
@@ -15,10 +15,67 @@ ATTENDEES_CACHE_PATH = config(
 )
 
 ATTENDEES_CACHE_ENABLED = config("ATTENDEES_CACHE_ENABLED", default=False, cast=bool)
+ATTENDEES_CACHE_FLUSH_DELAY = config(
+    "ATTENDEES_CACHE_FLUSH_DELAY", default=5.0, cast=float
+)
+ATTENDEES_CACHE_JOURNAL_ENABLED = config(
+    "ATTENDEES_CACHE_JOURNAL_ENABLED", default=False, cast=bool
+)
+ATTENDEES_CACHE_COMPACT_THRESHOLD = config(
+    "ATTENDEES_CACHE_COMPACT_THRESHOLD", default=4 * 1024 * 1024, cast=int
+)
+ATTENDEES_INDEX_MEMBERSHIP_ONLY = config(
+    "ATTENDEES_INDEX_MEMBERSHIP_ONLY", default=False, cast=bool
+)
+
+HTTP_HTTP2 = config("HTTP_HTTP2", default=False, cast=bool)
+HTTP_MAX_CONNECTIONS = config("HTTP_MAX_CONNECTIONS", default=10, cast=int)
+HTTP_MAX_KEEPALIVE_CONNECTIONS = config(
+    "HTTP_MAX_KEEPALIVE_CONNECTIONS", default=5, cast=int
+)
+HTTP_KEEPALIVE_EXPIRY = config("HTTP_KEEPALIVE_EXPIRY", default=60.0, cast=float)
+HTTP_TIMEOUT = config("HTTP_TIMEOUT", default=10.0, cast=float)
+HTTP_MAX_CONCURRENCY = config("HTTP_MAX_CONCURRENCY", default=5, cast=int)
+HTTP_MAX_RETRIES = config("HTTP_MAX_RETRIES", default=4, cast=int)
+HTTP_RETRY_BASE_DELAY = config("HTTP_RETRY_BASE_DELAY", default=1.0, cast=float)
+HTTP_RETRY_MAX_DELAY = config("HTTP_RETRY_MAX_DELAY", default=30.0, cast=float)
+
+EVENTBRITE_RATE_LIMIT = config("EVENTBRITE_RATE_LIMIT", default=2000 / 3600, cast=float)
+EVENTBRITE_RATE_BURST = config("EVENTBRITE_RATE_BURST", default=100, cast=int)
+EVENTBRITE_FULL_RESYNC_INTERVAL = config(
+    "EVENTBRITE_FULL_RESYNC_INTERVAL", default=6 * 3600, cast=float
+)
+PRETALX_RATE_LIMIT = config("PRETALX_RATE_LIMIT", default=5.0, cast=float)
+PRETALX_RATE_BURST = config("PRETALX_RATE_BURST", default=10, cast=int)
+
+AUTH_PENDING_MAX_ENTRIES = config("AUTH_PENDING_MAX_ENTRIES", default=10_000, cast=int)
+AUTH_SWEEP_RATE = config("AUTH_SWEEP_RATE", default=5.0, cast=float)
+AUTH_SWEEP_BURST = config("AUTH_SWEEP_BURST", default=5, cast=int)
+AUTH_QUEUE_WORKERS = config("AUTH_QUEUE_WORKERS", default=8, cast=int)
+AUTH_QUEUE_MAX_SIZE = config("AUTH_QUEUE_MAX_SIZE", default=5000, cast=int)
+AUTH_LOG_FLUSH_INTERVAL = config("AUTH_LOG_FLUSH_INTERVAL", default=5.0, cast=float)
+AUTH_LOG_MAX_RECORDS = config("AUTH_LOG_MAX_RECORDS", default=20, cast=int)
+AUTH_USER_RATE_LIMIT = config("AUTH_USER_RATE_LIMIT", default=1 / 30, cast=float)
+AUTH_USER_RATE_BURST = config("AUTH_USER_RATE_BURST", default=5, cast=int)
+AUTH_NEGATIVE_CACHE_TTL = config("AUTH_NEGATIVE_CACHE_TTL", default=300.0, cast=float)
+
+METRICS_PORT = config("METRICS_PORT", default=0, cast=int)
+METRICS_HOST = config("METRICS_HOST", default="127.0.0.1")
+
+TEMPLATES_HOT_RELOAD = config("TEMPLATES_HOT_RELOAD", default=False, cast=bool)
 
 PRETALX_EVENT_SLUT = config("PRETALX_EVENT_SLUT")
 PRETALX_TOKEN = config("PRETALX_TOKEN")
 
+TALKS_ANNOUNCEMENT_LEAD_MINUTES = config(
+    "TALKS_ANNOUNCEMENT_LEAD_MINUTES", default=10, cast=int
+)
+TALKS_SCHEDULE_SYNC_MINUTES = config("TALKS_SCHEDULE_SYNC_MINUTES", default=5, cast=int)
+TALKS_PUBLISH_CONCURRENCY = config("TALKS_PUBLISH_CONCURRENCY", default=4, cast=int)
+TALKS_ANNOUNCED_CACHE = config(
+    "TALKS_ANNOUNCED_CACHE", default="/tmp/pybr2022-announced-talks.json", cast=Path
+)
+
 DISCORD_ROOM_KEYNOTE = config("DISCORD_ROOM_KEYNOTE", cast=int)
 DISCORD_ROOM_ARUANA = config("DISCORD_ROOM_ARUANA", cast=int)
 DISCORD_ROOM_TUCUNARE = config("DISCORD_ROOM_TUCUNARE", cast=int)
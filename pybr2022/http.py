@@ -0,0 +1,178 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from httpx import AsyncClient, Limits, Request, Response, Timeout, TimeoutException
+from loguru import logger
+
+from pybr2022.ratelimit import RetryPolicy, TokenBucket, parse_retry_after
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # pragma: no cover
+    h2 = None
+
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class ClientSettings:
+    http2: bool = False
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 60.0
+    timeout: float = 10.0
+
+
+@dataclass
+class ConnectionStats:
+    requests: int = 0
+    connections: int = 0
+    tls_handshakes: int = 0
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.connections, 0)
+
+    def __str__(self) -> str:
+        return (
+            f"requests={self.requests}, connections={self.connections}, "
+            f"tls_handshakes={self.tls_handshakes}, reused={self.reused}"
+        )
+
+
+@dataclass
+class _ConnectionTracer:
+    stats: ConnectionStats = field(default_factory=ConnectionStats)
+
+    async def on_request(self, request: Request):
+        self.stats.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def trace(self, event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            self.stats.connections += 1
+        elif event == "connection.start_tls.complete":
+            self.stats.tls_handshakes += 1
+
+
+def build_client(settings: ClientSettings, stats: ConnectionStats) -> AsyncClient:
+    """Build a pooled client meant to live as long as the bot."""
+    http2 = settings.http2
+    if http2 and h2 is None:
+        logger.warning("HTTP/2 disabled, install httpx[http2] to enable it")
+        http2 = False
+
+    tracer = _ConnectionTracer(stats)
+    return AsyncClient(
+        http2=http2,
+        limits=Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        timeout=Timeout(settings.timeout),
+        event_hooks={"request": [tracer.on_request]},
+    )
+
+
+async def request_with_retry(
+    client: AsyncClient,
+    url: str,
+    limiter: TokenBucket,
+    retry_policy: RetryPolicy,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+) -> Response:
+    """GET ``url`` retrying timeouts, 429 and 5xx responses.
+
+    The limiter slot is released while backing off, and a ``Retry-After``
+    from the upstream pauses every request sharing the same limiter.
+    """
+    for attempt in range(retry_policy.max_attempts):
+        error = response = None
+        async with limiter.slot():
+            try:
+                response = await client.get(url, params=params, headers=headers)
+            except TimeoutException as exc:
+                error = exc
+
+        if response is not None:
+            limiter.update_from_headers(response.headers)
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+
+        if attempt + 1 == retry_policy.max_attempts:
+            break
+
+        delay = retry_policy.backoff(attempt)
+        if response is not None:
+            retry_after = parse_retry_after(response.headers)
+            if retry_after is not None:
+                limiter.block_for(retry_after)
+                delay = retry_after
+
+        logger.warning(
+            f"Retrying request. url={url}, attempt={attempt + 1}, delay={delay:.2f}, "
+            f"status_code={response.status_code if response is not None else None}, error={error!r}"
+        )
+        await asyncio.sleep(delay)
+
+    if error is not None:
+        raise error
+    return response
+
+
+@dataclass
+class CachedResponse:
+    data: Any
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Free slot for callers to keep objects parsed from ``data``.
+    parsed: Any = None
+
+    def validators(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """LRU of JSON responses kept with their ETag/Last-Modified validators."""
+
+    def __init__(self, max_entries: int = 256):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url: str, params: Optional[dict] = None) -> str:
+        return str(Request("GET", url, params=params).url)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key: str, response: Response) -> CachedResponse:
+        entry = CachedResponse(
+            data=response.json(),
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+        if entry.validators():
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,9 +1,7 @@
-from discord import Intents
-
 from pybr2022 import config
-from pybr2022.bot import Bot
+from pybr2022.bot import Bot, build_intents
 
-bot = Bot(command_prefix="pybr!", intents=Intents.all())
+bot = Bot(command_prefix="pybr!", intents=build_intents())
 
 if __name__ == "__main__":
     bot.run(config.DISCORD_TOKEN)
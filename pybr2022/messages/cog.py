@@ -28,9 +28,7 @@ class MessagesCog(commands.Cog):
     @commands.command("boasvindas")
     @commands.has_permissions(manage_guild=True)
     async def welcome(self, *args, **kwargs):
-        message = render_template(
-            "pybr2022/messages/templates/welcome.md", bot_id=self.bot.application_id
-        )
+        message = render_template("messages/welcome", bot_id=self.bot.application_id)
         channel = await self._get_channel(self._welcome_channel)
         await channel.send(message, suppress_embeds=True)
 
@@ -0,0 +1,182 @@
+import time
+from typing import Optional
+
+# Each power of two is split in 2**SUB_BITS buckets, so a recorded value is
+# off by at most 1/2**SUB_BITS (12.5%) of itself.
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, value: int = 1):
+        self.value += value
+
+
+class Histogram:
+    """Latency histogram with log-linear buckets, like HdrHistogram.
+
+    Values are kept in microseconds. Buckets are sparse, so a histogram only
+    costs memory for the ranges it actually saw.
+    """
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+
+    @staticmethod
+    def bucket(micros: int) -> int:
+        if micros < SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - SUB_BITS - 1
+        return (shift + 1) * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def upper_bound(bucket: int) -> int:
+        """Smallest value, in microseconds, above everything in ``bucket``."""
+        if bucket < SUB_BUCKETS:
+            return bucket + 1
+        shift = bucket // SUB_BUCKETS - 1
+        return (SUB_BUCKETS + bucket % SUB_BUCKETS + 1) << shift
+
+    def time(self) -> "Timer":
+        return Timer(self)
+
+    def record(self, seconds: float):
+        micros = int(seconds * 1_000_000)
+        bucket = self.bucket(micros)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound, in seconds, of the bucket holding the percentile."""
+        if not self.count:
+            return 0.0
+
+        rank = self.count * percent / 100
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return self.upper_bound(bucket) / 1_000_000
+        return self.upper_bound(max(self.counts)) / 1_000_000
+
+    def cumulative(self):
+        """``(upper bound in seconds, count of values below it)`` pairs."""
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            yield self.upper_bound(bucket) / 1_000_000, seen
+
+
+class Timer:
+    __slots__ = ("_histogram", "_started_at")
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.record(time.perf_counter() - self._started_at)
+
+
+class MetricsRegistry:
+    """Counters and histograms kept in memory, named like Prometheus metrics."""
+
+    def __init__(self, prefix: str = "pybr2022"):
+        self._prefix = prefix
+        self._counters: dict[tuple[str, Labels], Counter] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+
+    def counter(self, name: str, **labels) -> Counter:
+        key = (name, _labels(labels))
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = Counter()
+        return counter
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        key = (name, _labels(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        return histogram
+
+    def inc(self, name: str, value: int = 1, **labels):
+        self.counter(name, **labels).inc(value)
+
+    def timer(self, name: str, **labels) -> Timer:
+        return Timer(self.histogram(name, **labels))
+
+    def clear(self):
+        self._counters.clear()
+        self._histograms.clear()
+
+    def summary(self) -> list[str]:
+        """One line per metric, for humans."""
+        lines = []
+        for (name, labels), counter in sorted(self._counters.items()):
+            lines.append(f"{name}{_format_labels(labels)} {counter.value}")
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            lines.append(
+                "{name}{labels} count={count} p50={p50:.1f}ms p90={p90:.1f}ms p99={p99:.1f}ms".format(
+                    name=name,
+                    labels=_format_labels(labels),
+                    count=histogram.count,
+                    p50=histogram.percentile(50) * 1000,
+                    p90=histogram.percentile(90) * 1000,
+                    p99=histogram.percentile(99) * 1000,
+                )
+            )
+        return lines
+
+    def render_prometheus(self) -> str:
+        lines = []
+        typed = set()
+        for (name, labels), counter in sorted(self._counters.items()):
+            name = f"{self._prefix}_{name}_total"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {counter.value}")
+
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            name = f"{self._prefix}_{name}"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for upper_bound, count in histogram.cumulative():
+                le = ("le", f"{upper_bound:g}")
+                lines.append(f"{name}_bucket{_format_labels(labels, le)} {count}")
+            le = ("le", "+Inf")
+            lines.append(f"{name}_bucket{_format_labels(labels, le)} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
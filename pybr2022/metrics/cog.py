@@ -0,0 +1,73 @@
+import io
+from typing import Optional
+
+import discord
+from aiohttp import web
+from discord.ext import commands
+from loguru import logger
+
+from . import MetricsRegistry, metrics
+
+MESSAGE_MAX_LENGTH = 2000
+
+
+class MetricsCog(commands.Cog):
+    """Show the metrics to admins and, optionally, to Prometheus.
+
+    The Prometheus text endpoint is only started when ``port`` is set and
+    binds to localhost by default.
+    """
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        port: int = 0,
+        host: str = "127.0.0.1",
+        registry: MetricsRegistry = metrics,
+    ):
+        self.bot = bot
+        self._port = port
+        self._host = host
+        self._registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self._registry.render_prometheus(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    async def cog_load(self):
+        if not self._port:
+            return
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        logger.info(f"Metrics endpoint started. host={self._host}, port={self._port}")
+
+    async def cog_unload(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @commands.command("metricas")
+    @commands.has_permissions(manage_guild=True)
+    async def show_metrics(
+        self,
+        context: commands.Context,
+        *args,
+    ):
+        summary = "\n".join(self._registry.summary()) or "Nenhuma métrica registrada"
+        reply = f"```\n{summary}\n```"
+        if len(reply) <= MESSAGE_MAX_LENGTH:
+            await context.reply(reply)
+            return
+
+        await context.reply(
+            "Métricas no anexo",
+            file=discord.File(io.BytesIO(summary.encode()), filename="metricas.txt"),
+        )
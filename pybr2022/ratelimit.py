@@ -0,0 +1,108 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+
+class TokenBucket:
+    """Async token bucket with a cap on concurrent requests.
+
+    ``rate`` tokens are added per second up to ``capacity``. The bucket can
+    also be blocked for a while, e.g. when the upstream asks us to back off.
+    """
+
+    def __init__(self, rate: float, capacity: int, max_concurrency: int = 5):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return False
+
+        self._refill(now)
+        if self._tokens < 1:
+            return False
+
+        self._tokens -= 1
+        return True
+
+    async def acquire(self):
+        async with self._lock:
+            while not self.try_acquire():
+                now = time.monotonic()
+                wait = max(
+                    self._blocked_until - now,
+                    (1 - self._tokens) / self.rate,
+                )
+                await asyncio.sleep(wait)
+
+    def block_for(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+        if remaining is None or reset is None:
+            return
+
+        try:
+            remaining, reset = int(remaining), float(reset)
+        except ValueError:
+            return
+
+        if remaining > 0:
+            return
+
+        # Some APIs send the reset as an epoch, others as seconds left.
+        if reset > 1_000_000_000:
+            reset -= time.time()
+        self.block_for(max(reset, 0))
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        async with self._concurrency:
+            yield
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, ``attempt`` starts at 0."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
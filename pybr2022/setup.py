@@ -5,27 +5,78 @@ from pybr2022 import config
 from pybr2022.auth.cog import AuthenticationCog
 from pybr2022.auth.eventbrite import EventBrite
 from pybr2022.auth.index import AttendeesIndex
+from pybr2022.auth.pending import PendingVerifications
+from pybr2022.auth.throttle import NegativeCache, UserRateLimiter
+from pybr2022.http import ClientSettings
+from pybr2022.ratelimit import RetryPolicy, TokenBucket
 from pybr2022.messages.cog import MessagesCog
+from pybr2022.metrics.cog import MetricsCog
 from pybr2022.talks.pretalx import Pretalx
 from pybr2022.talks.cog import TalksCog
+from pybr2022.utils import templates
 
 
 async def setup(bot: Bot):
+    templates.hot_reload = config.TEMPLATES_HOT_RELOAD
+
     logger.info("Getting Discord server")
     guild = await bot.fetch_guild(config.DISCORD_SERVER_ID)
 
+    client_settings = ClientSettings(
+        http2=config.HTTP_HTTP2,
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        timeout=config.HTTP_TIMEOUT,
+    )
+    retry_policy = RetryPolicy(
+        max_attempts=config.HTTP_MAX_RETRIES,
+        base_delay=config.HTTP_RETRY_BASE_DELAY,
+        max_delay=config.HTTP_RETRY_MAX_DELAY,
+    )
+
     logger.info("Setup EventBrite")
-    eventbrite = EventBrite(config.EVENTBRITE_EVENT_ID, config.EVENTBRITE_TOKEN)
+    eventbrite = EventBrite(
+        config.EVENTBRITE_EVENT_ID,
+        config.EVENTBRITE_TOKEN,
+        client_settings,
+        TokenBucket(
+            config.EVENTBRITE_RATE_LIMIT,
+            config.EVENTBRITE_RATE_BURST,
+            config.HTTP_MAX_CONCURRENCY,
+        ),
+        retry_policy,
+    )
 
     logger.info("Setup AttendeesIndex")
     attendees_index = AttendeesIndex(
-        config.ATTENDEES_CACHE_PATH, config.ATTENDEES_CACHE_ENABLED
+        config.ATTENDEES_CACHE_PATH,
+        config.ATTENDEES_CACHE_ENABLED,
+        config.ATTENDEES_CACHE_FLUSH_DELAY,
+        config.ATTENDEES_CACHE_JOURNAL_ENABLED,
+        config.ATTENDEES_CACHE_COMPACT_THRESHOLD,
+        lazy_load=True,
+        membership_only=config.ATTENDEES_INDEX_MEMBERSHIP_ONLY,
     )
+    attendees_index.start_loading()
 
     logger.info("Setup TalksCog")
-    pretalx = Pretalx(config.PRETALX_EVENT_SLUT, config.PRETALX_TOKEN)
+    pretalx = Pretalx(
+        config.PRETALX_EVENT_SLUT,
+        config.PRETALX_TOKEN,
+        client_settings,
+        TokenBucket(
+            config.PRETALX_RATE_LIMIT,
+            config.PRETALX_RATE_BURST,
+            config.HTTP_MAX_CONCURRENCY,
+        ),
+        retry_policy,
+    )
     await bot.add_cog(TalksCog(bot, guild, pretalx))
 
+    logger.info("Setup MetricsCog")
+    await bot.add_cog(MetricsCog(bot, config.METRICS_PORT, config.METRICS_HOST))
+
     logger.info("Setup MessageCog")
     await bot.add_cog(MessagesCog(bot, guild, config.DISCORD_WELCOME_CHANNEL))
 
@@ -37,5 +88,16 @@ async def setup(bot: Bot):
             eventbrite,
             attendees_index,
             config.DISCORD_ATTENTEE_ROLE_NAME,
+            PendingVerifications(config.AUTH_PENDING_MAX_ENTRIES),
+            TokenBucket(config.AUTH_SWEEP_RATE, config.AUTH_SWEEP_BURST),
+            config.AUTH_QUEUE_WORKERS,
+            config.AUTH_QUEUE_MAX_SIZE,
+            config.AUTH_LOG_FLUSH_INTERVAL,
+            config.AUTH_LOG_MAX_RECORDS,
+            user_limiter=UserRateLimiter(
+                config.AUTH_USER_RATE_LIMIT, config.AUTH_USER_RATE_BURST
+            ),
+            negative_cache=NegativeCache(config.AUTH_NEGATIVE_CACHE_TTL),
+            full_resync_interval=config.EVENTBRITE_FULL_RESYNC_INTERVAL,
         )
     )
@@ -7,9 +7,12 @@ from discord.ext import commands, tasks
 from loguru import logger
 
 from pybr2022 import config
+from pybr2022.metrics import metrics
 from pybr2022.utils import render_template
 from .pretalx import Pretalx
 from .models import Talk
+from .schedule import ANNOUNCED_TALK_TYPES, Schedule
+from .scheduler import AnnouncementScheduler
 
 
 DISCORD_ROOMS = {
@@ -31,18 +34,46 @@ class TalksCog(commands.Cog):
         self.pretalx = pretalx_client
         self._guild = guild
         self._attendee_role = None
+        self._schedule: Optional[Schedule] = None
+        self._scheduled: Optional[Schedule] = None
+        self._room_channels: dict[int, discord.abc.GuildChannel] = {}
+        self._publish_limit = asyncio.Semaphore(config.TALKS_PUBLISH_CONCURRENCY)
+        self.scheduler = AnnouncementScheduler(
+            self._publish_talks_in_channels,
+            timedelta(minutes=config.TALKS_ANNOUNCEMENT_LEAD_MINUTES),
+            state_path=config.TALKS_ANNOUNCED_CACHE,
+        )
+        self._start_tasks()
 
-    def _filter_talks_next_hour(self, talks: list[Talk]) -> list[Talk]:
-        return [
-            talk for talk in talks
-            if talk.start_in_30_min
-        ]
+    def _start_tasks(self):
+        self.scheduler.start()
+        self._sync_schedule.start()
 
-    def _filter_talks_per_type(self, talks: list[Talk]) -> list[Talk]:
-        return [
-            talk for talk in talks
-            if talk.type.lower() in ["palestra", "palestra relâmpago", "keynote"]
-        ]
+    async def cog_unload(self):
+        self._sync_schedule.cancel()
+        self.scheduler.stop()
+        await self.pretalx.aclose()
+
+    @tasks.loop(minutes=config.TALKS_SCHEDULE_SYNC_MINUTES)
+    async def _sync_schedule(self):
+        try:
+            schedule = await self._get_schedule()
+            if schedule is not self._scheduled:
+                self.scheduler.sync(schedule)
+                self._scheduled = schedule
+        except Exception:
+            logger.exception("Error while loading schedule from Pretalx")
+
+    @_sync_schedule.before_loop
+    async def _before_sync_schedule(self):
+        await self._resolve_room_channels()
+
+    async def _get_schedule(self) -> Schedule:
+        talks = await self.pretalx.talks()
+        if self._schedule is None or not self._schedule.is_built_from(talks):
+            self._schedule = Schedule(talks)
+            logger.info(f"Schedule built. talks={len(self._schedule)}")
+        return self._schedule
 
     def _next_talk_message(self, talk: Talk) -> str:
         params = {
@@ -51,21 +82,106 @@ class TalksCog(commands.Cog):
             "youtube_link": talk.youtube,
         }
         if talk.is_keynote:
-            template = "pybr2022/talks/templates/next_talk_keynote.md"
+            template = "talks/next_talk_keynote"
         else:
-            template = "pybr2022/talks/templates/next_talk.md"
+            template = "talks/next_talk"
             params["speaker"] = talk.speaker
 
         return render_template(template, **params)
 
-    async def _publish_talks_in_channels(self, talks: list[Talk], test_channel=None):
-        for talk in talks:
-            room_id = DISCORD_ROOMS.get(talk.room.lower())
-            logger.info(f"Publishing next schedule. room={room_id}")
+    async def _get_room_channel(self, room_id: int) -> discord.abc.GuildChannel:
+        channel = self._room_channels.get(room_id)
+        if channel is None:
             channel = await self._guild.fetch_channel(room_id)
+            self._room_channels[room_id] = channel
+        return channel
+
+    async def _resolve_room_channels(self):
+        results = await asyncio.gather(
+            *(self._get_room_channel(room_id) for room_id in DISCORD_ROOMS.values()),
+            return_exceptions=True,
+        )
+        for room_id, result in zip(DISCORD_ROOMS.values(), results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    f"Room channel not resolved. room={room_id}, error={result!r}"
+                )
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        if after.id in self._room_channels:
+            self._room_channels[after.id] = after
 
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self._room_channels.pop(channel.id, None)
+
+    async def _publish_talks_in_room(
+        self,
+        room_id: int,
+        talks: list[Talk],
+        channel: Optional[discord.abc.Messageable] = None,
+    ) -> list[Talk]:
+        channel = channel or await self._get_room_channel(room_id)
+        sent = []
+        for talk in talks:
+            logger.info(f"Publishing next schedule. room={room_id}")
             message = self._next_talk_message(talk)
-            await channel.send(message, suppress_embeds=True)
+            try:
+                async with self._publish_limit:
+                    await channel.send(message, suppress_embeds=True)
+            except Exception:
+                metrics.inc("talks_publish_errors")
+                logger.exception(
+                    f"Error while publishing talk. room={room_id}, talk={talk.title!r}"
+                )
+                continue
+            sent.append(talk)
+        return sent
+
+    async def _publish_talks_in_channels(
+        self, talks: list[Talk], test_channel=None
+    ) -> list[Talk]:
+        """Publish the talks and return the ones that need no retry.
+
+        That is the talks sent and the ones in rooms without a channel,
+        which would never succeed. With ``test_channel`` every talk goes to
+        that channel instead of its room.
+        """
+        if test_channel is not None:
+            return await self._publish_talks_in_room(
+                test_channel.id, talks, test_channel
+            )
+
+        done: list[Talk] = []
+        rooms: dict[int, list[Talk]] = {}
+        for talk in talks:
+            room_id = DISCORD_ROOMS.get(talk.room.lower())
+            if room_id is None:
+                logger.warning(
+                    f"Talk in unknown room. room={talk.room!r}, talk={talk.title!r}"
+                )
+                done.append(talk)
+                continue
+            rooms.setdefault(room_id, []).append(talk)
+
+        with metrics.timer("talks_publish_seconds"):
+            results = await asyncio.gather(
+                *(
+                    self._publish_talks_in_room(room_id, talks)
+                    for room_id, talks in rooms.items()
+                ),
+                return_exceptions=True,
+            )
+        for room_id, result in zip(rooms, results):
+            if isinstance(result, Exception):
+                metrics.inc("talks_publish_errors")
+                logger.opt(exception=result).error(
+                    f"Error while publishing next schedule. room={room_id}"
+                )
+            else:
+                done.extend(result)
+        return done
 
     @commands.command("palestras")
     @commands.has_permissions(manage_guild=True)
@@ -75,7 +191,10 @@ class TalksCog(commands.Cog):
         *args,
     ):
         channel = context.message.channel if args else None
-        talks = await self.pretalx.talks()
-        talks = self._filter_talks_per_type(talks)
-        talks = self._filter_talks_next_hour(talks)
-        await self._publish_talks_in_channels(talks, channel)
\ No newline at end of file
+        schedule = await self._get_schedule()
+        talks = schedule.upcoming(30, types=ANNOUNCED_TALK_TYPES)
+        if channel is None:
+            await self.scheduler.announce(talks)
+        else:
+            # A preview, the announcements stay scheduled.
+            await self._publish_talks_in_channels(talks, test_channel=channel)
@@ -1,3 +1,4 @@
+import sys
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
 from enum import Enum
@@ -6,7 +7,7 @@ from enum import Enum
 MANAUS_TZ_OFFSET = timezone(timedelta(hours=-4))
 
 
-@dataclass
+@dataclass(slots=True)
 class Talk:
     title: str
     speaker: str
@@ -31,7 +32,7 @@ class Talk:
 
     @staticmethod
     def get_room(room: str):
-        return room.replace(" - Vasco Vasquez", "")
+        return sys.intern(room.replace(" - Vasco Vasquez", ""))
 
     @staticmethod
     def get_pretalx_link(code: str) -> str:
@@ -70,7 +71,7 @@ class Talk:
             _room=Talk.get_room(data["slot"]["room"]["pt-BR"]),
             start=Talk.get_datetime(data["slot"]["start"]),
             end=Talk.get_datetime(data["slot"]["end"]),
-            type=data["submission_type"]["pt-BR"],
+            type=sys.intern(data["submission_type"]["pt-BR"]),
             pretalx=Talk.get_pretalx_link(data["code"]),
             youtube=Talk.get_youtube_link(data["description"]),
         )
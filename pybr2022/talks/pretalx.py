@@ -1,67 +1,112 @@
-import asyncio
 from typing import Optional
 
 from loguru import logger
-from httpx import AsyncClient, HTTPError, ReadTimeout
+from httpx import AsyncClient, HTTPError
 
+from pybr2022.http import (
+    CachedResponse,
+    ClientSettings,
+    ConnectionStats,
+    ResponseCache,
+    build_client,
+    request_with_retry,
+)
+from pybr2022.metrics import metrics
+from pybr2022.ratelimit import RetryPolicy, TokenBucket
 from .models import Talk
 
 
-MAX_API_CALL_RETRIES = 3
-api_calls_limit = asyncio.Semaphore(5)
+DEFAULT_RATE_LIMIT = 5
+DEFAULT_RATE_BURST = 10
+
+
+class PretalxAPIException(Exception):
+    pass
 
 
 class Pretalx:
     BASE_URL = "https://pretalx.com/api"
 
-    def __init__(self, event_slug: str, api_token: str):
+    def __init__(
+        self,
+        event_slug: str,
+        api_token: str,
+        client_settings: Optional[ClientSettings] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
         self.event_slug = event_slug
         self.api_token = api_token
+        self._rate_limiter = rate_limiter or TokenBucket(
+            DEFAULT_RATE_LIMIT, DEFAULT_RATE_BURST
+        )
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._cache = ResponseCache()
+        self.connection_stats = ConnectionStats()
+        self._client_settings = client_settings or ClientSettings()
+        self._client: Optional[AsyncClient] = None
+
+    def _get_client(self) -> AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = build_client(self._client_settings, self.connection_stats)
+        return self._client
 
-    def _get_client(self):
-        return AsyncClient()
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            logger.info(f"Pretalx client closed. {self.connection_stats}")
 
     async def _request(
         self,
         client: AsyncClient,
         url: str,
         params: Optional[dict] = None,
-        retries: int = MAX_API_CALL_RETRIES,
-    ) -> dict:
-        params = params or {}
-        async with api_calls_limit:
-            try:
-                response = await client.get(url, params=params, timeout=10)
-            except ReadTimeout:
-                if retries > 1:
-                    seconds = (MAX_API_CALL_RETRIES - retries + 1) * 2
-                    await asyncio.sleep(seconds)
-                    return await self._request(client, url, params, retries - 1)
-                else:
-                    raise
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                raise Exception(
-                    f"Error when calling EventBrite API. content={response.text!r}, url={url}, status_code={response.status_code}"
-                )
-        return response.json()
+    ) -> CachedResponse:
+        key = self._cache.key(url, params)
+        cached = self._cache.get(key)
+        with metrics.timer("upstream_request_seconds", upstream="pretalx"):
+            response = await request_with_retry(
+                client,
+                url,
+                self._rate_limiter,
+                self._retry_policy,
+                params=params,
+                headers=cached.validators() if cached else None,
+            )
+        metrics.inc(
+            "upstream_responses", upstream="pretalx", status=response.status_code
+        )
+        if cached and response.status_code == 304:
+            self._cache.hits += 1
+            return cached
+
+        try:
+            response.raise_for_status()
+        except HTTPError:
+            raise PretalxAPIException(
+                f"Error when calling Pretalx API. content={response.text!r}, url={url}, status_code={response.status_code}"
+            )
+        self._cache.misses += 1
+        return self._cache.store(key, response)
 
     async def talks(self):
         talks = []
         url = f"{self.BASE_URL}/events/{self.event_slug}/talks/"
-        params = {
-            "limit": 100
-        }
-
-        async with self._get_client() as client:
-            while url:
-                response = await self._request(client, url, params)
-                logger.info(f"Talks returned from Pretalx. talks={len(response['results'])}, next={response['next']}")
-                talks += [
-                    Talk.from_pretalx(data)
-                    for data in response["results"]
-                ]
-                url = response["next"]
-
-        return talks
\ No newline at end of file
+        params = {"limit": 100}
+
+        client = self._get_client()
+        while url:
+            page = await self._request(client, url, params)
+            if page.parsed is None:
+                page.parsed = [Talk.from_pretalx(data) for data in page.data["results"]]
+            logger.info(
+                f"Talks returned from Pretalx. talks={len(page.parsed)}, next={page.data['next']}"
+            )
+            talks += page.parsed
+            url = page.data["next"]
+
+        logger.info(
+            f"Pretalx connections. {self.connection_stats}, cache_hits={self._cache.hits}, cache_misses={self._cache.misses}"
+        )
+
+        return talks
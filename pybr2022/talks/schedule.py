@@ -0,0 +1,83 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from heapq import merge
+from operator import attrgetter
+from typing import Iterable, Optional
+
+from .models import MANAUS_TZ_OFFSET, Talk
+
+ANNOUNCED_TALK_TYPES = ("palestra", "palestra relâmpago", "keynote")
+
+_start = attrgetter("start")
+
+
+class _Timeline:
+    def __init__(self, talks: list[Talk]):
+        self.talks = talks
+        self.starts = [talk.start for talk in talks]
+
+    def between(self, start: datetime, end: datetime) -> list[Talk]:
+        first = bisect_right(self.starts, start)
+        last = bisect_left(self.starts, end, lo=first)
+        return self.talks[first:last]
+
+
+class Schedule:
+    """Talks sorted by start time and indexed by room and type."""
+
+    def __init__(self, talks: Iterable[Talk]):
+        self.talks = sorted(talks, key=_start)
+        self._all = _Timeline(self.talks)
+        self._by_room = self._group(lambda talk: talk.room.lower())
+        self._by_type = self._group(lambda talk: talk.type.lower())
+
+    def _group(self, key) -> dict[str, _Timeline]:
+        groups: dict[str, list[Talk]] = {}
+        for talk in self.talks:
+            groups.setdefault(key(talk), []).append(talk)
+        return {name: _Timeline(talks) for name, talks in groups.items()}
+
+    def __len__(self) -> int:
+        return len(self.talks)
+
+    def is_built_from(self, talks: list[Talk]) -> bool:
+        """Tell whether ``talks`` are the very same objects of this schedule."""
+        return len(talks) == len(self.talks) and set(map(id, talks)) == set(
+            map(id, self.talks)
+        )
+
+    def upcoming(
+        self,
+        minutes: int = 30,
+        room: Optional[str] = None,
+        types: Optional[Iterable[str]] = None,
+        now: Optional[datetime] = None,
+    ) -> list[Talk]:
+        """Talks starting in the next ``minutes``, optionally in one room.
+
+        ``now`` is read once, so every talk is compared against the same clock.
+        """
+        now = now or datetime.now(tz=MANAUS_TZ_OFFSET)
+        end = now + timedelta(minutes=minutes)
+        types = {talk_type.lower() for talk_type in types} if types else None
+
+        if room is not None:
+            timeline = self._by_room.get(room.lower())
+            talks = timeline.between(now, end) if timeline else []
+            if types is None:
+                return talks
+            return [talk for talk in talks if talk.type.lower() in types]
+
+        if types is None:
+            return self._all.between(now, end)
+
+        return list(
+            merge(
+                *(
+                    self._by_type[talk_type].between(now, end)
+                    for talk_type in types
+                    if talk_type in self._by_type
+                ),
+                key=_start,
+            )
+        )
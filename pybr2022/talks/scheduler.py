@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Optional
+
+from loguru import logger
+
+from .models import MANAUS_TZ_OFFSET, Talk
+from .schedule import ANNOUNCED_TALK_TYPES, Schedule
+
+# Returns the talks that were delivered, the others are retried.
+Publisher = Callable[..., Awaitable[Iterable[Talk]]]
+RETRY_DELAY = timedelta(seconds=30)
+
+
+class AnnouncementScheduler:
+    """Announce each talk once, ``lead_time`` before it starts.
+
+    Timers live in a heap ordered by announcement time and a single task
+    sleeps until the earliest one is due. ``sync`` re-arms the heap whenever
+    the schedule changes; talks already announced are never armed again.
+
+    A talk only counts as announced once the publisher delivered it, talks
+    it failed to deliver are retried until they start. Announced talks are
+    kept in ``state_path``, so a restart doesn't announce them twice.
+    """
+
+    def __init__(
+        self,
+        publish: Publisher,
+        lead_time: timedelta,
+        types: Iterable[str] = ANNOUNCED_TALK_TYPES,
+        state_path: Optional[Path] = None,
+    ):
+        self._publish = publish
+        self._lead_time = lead_time
+        self._types = {talk_type.lower() for talk_type in types}
+        self._heap: list[tuple[datetime, int, Talk]] = []
+        self._counter = itertools.count()
+        self._state_path = state_path
+        self._announced = self._load_announced()
+        # Being published right now, so overlapping calls skip them.
+        self._in_flight: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def key(talk: Talk) -> str:
+        return talk.pretalx
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(tz=MANAUS_TZ_OFFSET)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _load_announced(self) -> set[str]:
+        if self._state_path is None or not self._state_path.is_file():
+            return set()
+
+        try:
+            return set(json.loads(self._state_path.read_text()))
+        except ValueError:
+            logger.warning(f"Invalid announced talks file. path={self._state_path}")
+            return set()
+
+    def _write_announced(self, keys: list[str]):
+        tmp_path = self._state_path.with_name(f".{self._state_path.name}.tmp")
+        tmp_path.write_text(json.dumps(keys))
+        os.replace(tmp_path, self._state_path)
+
+    async def _store_announced(self):
+        if self._state_path is None:
+            return
+
+        try:
+            await asyncio.to_thread(self._write_announced, sorted(self._announced))
+        except Exception:
+            logger.exception(
+                f"Error while storing announced talks. path={self._state_path}"
+            )
+
+    def sync(self, schedule: Schedule, now: Optional[datetime] = None):
+        now = now or self._now()
+        self._heap = [
+            (talk.start - self._lead_time, next(self._counter), talk)
+            for talk in schedule.talks
+            if talk.type.lower() in self._types
+            and talk.start > now
+            and self.key(talk) not in self._announced
+        ]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        logger.info(f"Talk announcements scheduled. talks={len(self._heap)}")
+
+    def _pop_due(self, now: datetime) -> list[Talk]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, talk = heapq.heappop(self._heap)
+            due.append(talk)
+        return due
+
+    def _retry(self, talks: list[Talk], now: datetime):
+        retry_at = now + RETRY_DELAY
+        retried = [talk for talk in talks if talk.start > now]
+        for talk in retried:
+            heapq.heappush(self._heap, (retry_at, next(self._counter), talk))
+        if retried:
+            self._wakeup.set()
+            logger.warning(f"Talk announcements to retry. talks={len(retried)}")
+
+    async def announce(
+        self, talks: Iterable[Talk], now: Optional[datetime] = None, **kwargs
+    ):
+        """Publish the talks that weren't announced yet."""
+        pending = [
+            talk
+            for talk in talks
+            if self.key(talk) not in self._announced
+            and self.key(talk) not in self._in_flight
+        ]
+        if not pending:
+            return
+
+        keys = {self.key(talk) for talk in pending}
+        self._in_flight |= keys
+        try:
+            delivered = {
+                self.key(talk) for talk in await self._publish(pending, **kwargs)
+            }
+        except Exception:
+            logger.exception(f"Error while announcing talks. talks={pending!r}")
+            delivered = set()
+        finally:
+            self._in_flight -= keys
+
+        if delivered:
+            self._announced |= delivered
+            await self._store_announced()
+        self._retry(
+            [talk for talk in pending if self.key(talk) not in delivered],
+            now or self._now(),
+        )
+
+    async def run_due(self, now: Optional[datetime] = None) -> Optional[float]:
+        """Announce due talks and return the seconds until the next one."""
+        now = now or self._now()
+        await self.announce(self._pop_due(now), now=now)
+        if not self._heap:
+            return None
+        return max((self._heap[0][0] - now).total_seconds(), 0)
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = await self.run_due()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
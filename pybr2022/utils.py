@@ -1,4 +1,75 @@
-def render_template(template_path: str, **kwargs):
-    with open(template_path) as fp:
-        text = fp.read().format(**kwargs)
-        return text
+from pathlib import Path
+from string import Formatter
+
+from loguru import logger
+
+PACKAGE_DIR = Path(__file__).parent
+
+
+class Template:
+    def __init__(self, path: Path):
+        self.path = path
+        self.mtime = path.stat().st_mtime
+        self.text = path.read_text()
+        self.fields = self._parse_fields(self.text)
+
+    def _parse_fields(self, text: str) -> frozenset[str]:
+        fields = set()
+        for _, field, _, _ in Formatter().parse(text):
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise ValueError(
+                    f"Template placeholders must be named. path={self.path}, field={field!r}"
+                )
+            fields.add(field)
+        return frozenset(fields)
+
+    def render(self, **kwargs) -> str:
+        missing = self.fields - kwargs.keys()
+        if missing:
+            raise KeyError(
+                f"Missing template variables. path={self.path}, missing={sorted(missing)}"
+            )
+        return self.text.format(**kwargs)
+
+
+class TemplateRegistry:
+    """Templates from ``pybr2022/*/templates``, loaded once and kept in memory.
+
+    Templates are named after their app and file, e.g. ``auth/authenticated``
+    for ``pybr2022/auth/templates/authenticated.md``.
+    """
+
+    def __init__(self, root: Path = PACKAGE_DIR, hot_reload: bool = False):
+        self.root = root
+        self.hot_reload = hot_reload
+        self._templates: dict[str, Template] = {}
+        self.load()
+
+    def load(self):
+        templates = {}
+        for path in sorted(self.root.glob("*/templates/*.md")):
+            templates[f"{path.parent.parent.name}/{path.stem}"] = Template(path)
+        self._templates = templates
+        logger.info(f"Templates loaded. templates={len(templates)}, root={self.root}")
+
+    def get(self, name: str) -> Template:
+        template = self._templates[name]
+        if self.hot_reload and template.path.stat().st_mtime != template.mtime:
+            template = self._templates[name] = Template(template.path)
+            logger.info(f"Template reloaded. name={name}")
+        return template
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def render(self, name: str, /, **kwargs) -> str:
+        return self.get(name).render(**kwargs)
+
+
+templates = TemplateRegistry()
+
+
+def render_template(name: str, /, **kwargs):
+    return templates.render(name, **kwargs)
@@ -1,17 +1,22 @@
+import time
 from unittest.mock import AsyncMock, Mock, patch
 
+import factory
 import pytest
-from discord import ChannelType
+from discord import ChannelType, NotFound
 
-from pybr2022.auth.cog import AuthenticationCog, find_email
+from pybr2022.auth.cog import AUTH_TOTAL, SYNC_OVERLAP, AuthenticationCog, find_email
 from pybr2022.auth.eventbrite import EventBrite
 from pybr2022.auth.index import AttendeesIndex
+from pybr2022.metrics import metrics
+from tests.test_auth.factories import AttendeeFactory
 
 
 @pytest.fixture
 @patch("pybr2022.auth.cog.AuthenticationCog._start_tasks", Mock())
 def auth_cog(attendees_index: AttendeesIndex):
     mock_bot = AsyncMock()
+    mock_bot.get_guild = Mock(return_value=None)
     mock_guild = AsyncMock()
     eventbrite = EventBrite("event-id", "eventbrite-api-token")
 
@@ -25,18 +30,100 @@ def auth_cog(attendees_index: AttendeesIndex):
 
 
 @pytest.mark.asyncio
-@patch("pybr2022.auth.cog.EventBrite.list_attendees")
-async def test_load_attendees(mock_list_attendees, auth_cog, attendee):
+@patch("pybr2022.auth.cog.EventBrite.iter_attendees")
+async def test_load_attendees(mock_iter_attendees, auth_cog, attendee):
     assert not auth_cog.attendees_index._index
     assert not auth_cog.attendees_index.updated_at
 
-    mock_list_attendees.return_value = [attendee]
+    async def pages(*args):
+        yield [attendee]
+
+    mock_iter_attendees.side_effect = pages
 
     await auth_cog._load_attendees()
 
-    assert len(auth_cog.attendees_index._index) == 2
+    assert len(auth_cog.attendees_index._index) == 1
     assert auth_cog.attendees_index.search(attendee.email) == attendee
-    assert auth_cog.attendees_index.search(attendee.order_id) == attendee
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.auth.cog.EventBrite.iter_changes")
+async def test_load_attendees_changes(mock_iter_changes, auth_cog):
+    kept, cancelled = AttendeeFactory.build_batch(2, id=factory.Sequence(str))
+    auth_cog.attendees_index.add_many([kept, cancelled])
+    checkpoint = auth_cog.attendees_index.updated_at
+    new = AttendeeFactory.build(id="new")
+
+    async def pages(*args):
+        yield [new], [cancelled]
+
+    mock_iter_changes.side_effect = pages
+
+    await auth_cog._load_attendees()
+
+    mock_iter_changes.assert_called_once_with(checkpoint - SYNC_OVERLAP)
+    assert set(auth_cog.attendees_index.keys()) == {
+        kept.email.lower(),
+        new.email.lower(),
+    }
+    assert auth_cog._sync_checkpoint > checkpoint
+    assert new.email.lower() in auth_cog.fuzzy_index
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.auth.cog.EventBrite.iter_attendees")
+async def test_load_attendees_full_resync(mock_iter_attendees, auth_cog):
+    kept, missing = AttendeeFactory.build_batch(2, id=factory.Sequence(str))
+    auth_cog.attendees_index.add_many([kept, missing])
+    auth_cog._sync_checkpoint = auth_cog.attendees_index.updated_at
+    auth_cog._last_full_resync = time.monotonic() - auth_cog._full_resync_interval
+
+    async def pages(*args):
+        yield [kept]
+
+    mock_iter_attendees.side_effect = pages
+
+    await auth_cog._load_attendees()
+
+    assert list(auth_cog.attendees_index.keys()) == [kept.email.lower()]
+    assert time.monotonic() - auth_cog._last_full_resync < 1
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.auth.cog.EventBrite.iter_attendees")
+async def test_full_resync_empty_pull(mock_iter_attendees, auth_cog):
+    attendee = AttendeeFactory.build(id="1")
+    auth_cog.attendees_index.add(attendee)
+
+    async def pages(*args):
+        yield []
+
+    mock_iter_attendees.side_effect = pages
+
+    await auth_cog._full_resync()
+
+    assert attendee.email in auth_cog.attendees_index
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.auth.cog.EventBrite.iter_attendees")
+async def test_full_resync_without_ids(mock_iter_attendees, auth_cog):
+    stale = AttendeeFactory.build(id="1")
+    auth_cog.attendees_index.add(stale)
+    pulled = AttendeeFactory.build()
+
+    async def pages(*args):
+        yield [pulled]
+
+    mock_iter_attendees.side_effect = pages
+
+    with patch("pybr2022.auth.cog.logger") as mock_logger:
+        await auth_cog._full_resync()
+
+    assert stale.email in auth_cog.attendees_index
+    assert pulled.email in auth_cog.attendees_index
+    (warning,), _ = mock_logger.warning.call_args
+    assert "without id" in warning
 
 
 def test_message_from_bot(auth_cog):
@@ -201,18 +288,44 @@ async def test_authenticate_not_attendee(
     mock_log_auth_failed.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_on_private_message(auth_cog):
+    message = AsyncMock()
+    await auth_cog.on_private_message(message)
+    assert auth_cog.auth_queue.depth == 1
+    message.author.send.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_on_private_message_queue_full(auth_cog):
+    auth_cog.auth_queue._max_size = 0
+    message = AsyncMock()
+    await auth_cog.on_private_message(message)
+    message.author.send.assert_called_once()
+
+
 @pytest.mark.asyncio
 @patch("pybr2022.auth.cog.AuthenticationCog.authenticate")
-async def test_on_message(mock_athenticate, auth_cog):
-    message = "message"
-    await auth_cog.on_message(message)
-    mock_athenticate.assert_called_with(message)
+async def test_on_private_message_authenticates(mock_authenticate, auth_cog):
+    auth_cog.auth_queue._handler = mock_authenticate
+    auth_cog.auth_queue.start()
+    message = AsyncMock()
+
+    await auth_cog.on_private_message(message)
+    await auth_cog.auth_queue.join()
+    auth_cog.auth_queue.stop()
 
+    mock_authenticate.assert_called_with(message)
 
+
+@patch("pybr2022.auth.cog.BatchedLogSink.start")
+@patch("pybr2022.auth.cog.AuthQueue.start")
 @patch("pybr2022.auth.cog.AuthenticationCog._load_attendees")
-def test_start_tasks(mock_load_attendees):
+def test_start_tasks(mock_load_attendees, mock_auth_queue_start, mock_log_sink_start):
     AuthenticationCog("bot", "guild", "eventbrite", "index", "attendee-role-name")
     mock_load_attendees.start.assert_called_once()
+    mock_auth_queue_start.assert_called_once()
+    mock_log_sink_start.assert_called_once()
 
 
 @pytest.mark.asyncio
@@ -251,6 +364,24 @@ def test_find_email(message, email):
     assert find_email(message) == email
 
 
+@pytest.mark.parametrize(
+    "queued, new, expected",
+    (
+        ("meu email: a@b.com", "obrigado!", False),
+        ("meu email: a@b.com", "na verdade é c@d.com", True),
+        ("oi", "a@b.com", True),
+        ("oi", "tudo bem?", True),
+    ),
+)
+def test_replaces_queued_message(queued, new, expected):
+    assert (
+        AuthenticationCog._replaces_queued_message(
+            Mock(content=queued), Mock(content=new)
+        )
+        is expected
+    )
+
+
 @pytest.mark.asyncio
 @patch("pybr2022.auth.cog.AuthenticationCog._get_channel")
 async def test_log_auth_failed(mock_get_channel, auth_cog):
@@ -259,4 +390,269 @@ async def test_log_auth_failed(mock_get_channel, auth_cog):
     mock_get_channel.return_value = channel
 
     await auth_cog._log_auth_failed(message)
+    await auth_cog._log_auth_failed(message)
+    channel.send.assert_not_called()
+
+    await auth_cog.log_sink.flush()
     channel.send.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_user_from_gateway_cache(auth_cog):
+    member = Mock()
+    auth_cog.bot.get_guild.return_value = Mock()
+    auth_cog.bot.get_guild.return_value.get_member.return_value = member
+
+    assert await auth_cog._get_user_from_server(Mock(id=1)) is member
+    auth_cog._guild.fetch_member.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_user_from_server_fallback(auth_cog):
+    member = Mock(id=1, roles=["everyone"])
+    auth_cog._guild.fetch_member.return_value = member
+
+    assert await auth_cog._get_user_from_server(member) is member
+    assert await auth_cog._get_user_from_server(member) is member
+    auth_cog._guild.fetch_member.assert_called_once_with(1)
+
+    updated = Mock(id=1, roles=["everyone"])
+    await auth_cog.on_member_update(member, updated)
+    assert await auth_cog._get_user_from_server(member) is updated
+
+    await auth_cog.on_member_remove(updated)
+    assert not auth_cog._members
+
+
+@pytest.mark.asyncio
+async def test_get_user_from_server_not_found(auth_cog):
+    auth_cog._guild.fetch_member.side_effect = NotFound(Mock(status=404), "")
+    assert await auth_cog._get_user_from_server(Mock(id=1)) is None
+
+
+@pytest.mark.asyncio
+async def test_get_attendee_role_from_gateway_cache(auth_cog):
+    role = Mock()
+    role.name = "attendee-role-name"
+    auth_cog.bot.get_guild.return_value = Mock(roles=[role])
+
+    assert await auth_cog._get_attendee_role() is role
+    auth_cog._guild.fetch_roles.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_attendee_role_invalidation(auth_cog):
+    role = Mock(id=1)
+    auth_cog._attendee_role = role
+
+    await auth_cog.on_guild_role_update(role, Mock(id=2))
+    assert auth_cog._attendee_role is role
+
+    renamed = Mock(id=1)
+    renamed.name = "other-role"
+    await auth_cog.on_guild_role_update(role, renamed)
+    assert auth_cog._attendee_role is None
+
+    auth_cog._attendee_role = role
+    await auth_cog.on_guild_role_delete(role)
+    assert auth_cog._attendee_role is None
+
+
+@pytest.mark.asyncio
+async def test_get_channel_from_gateway_cache(auth_cog):
+    channel = Mock()
+    channel.name = "logs"
+    auth_cog.bot.get_guild.return_value = Mock(channels=[channel])
+
+    assert await auth_cog._get_channel("logs") is channel
+    auth_cog._guild.fetch_channels.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_channel_cache_invalidation(auth_cog):
+    auth_cog._channels = [Mock()]
+    await auth_cog.on_guild_channel_update(Mock(), Mock())
+    assert auth_cog._channels is None
+
+
+@pytest.mark.asyncio
+async def test_missing_authentication_from_gateway_cache(auth_cog):
+    members = [Mock(id=1, roles=["everyone"]), Mock(id=2, roles=["everyone", "x"])]
+    auth_cog.bot.get_guild.return_value = Mock(chunked=True, members=members)
+    context = AsyncMock()
+
+    await auth_cog.missing_authentication.callback(auth_cog, context)
+    await auth_cog.missing_authentication.callback(auth_cog, context)
+
+    context.reply.assert_called_with("Pessoas não credenciadas: 1")
+    auth_cog._guild.fetch_members.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_missing_authentication_events(auth_cog):
+    async def fetch_members(limit):
+        yield Mock(id=1, roles=["everyone"])
+
+    auth_cog._guild.fetch_members = fetch_members
+    await auth_cog._populate_member_tracker()
+
+    await auth_cog.on_member_join(Mock(id=2, roles=["everyone"]))
+    assert len(auth_cog.member_tracker) == 2
+
+    await auth_cog.on_member_update(Mock(), Mock(id=1, roles=["everyone", "x"]))
+    await auth_cog.on_member_remove(Mock(id=2))
+    assert len(auth_cog.member_tracker) == 0
+
+
+@pytest.mark.asyncio
+async def test_missing_authentication_csv(auth_cog):
+    auth_cog.member_tracker.update(Mock(id=1, roles=["everyone"]))
+    auth_cog.member_tracker.ready = True
+    context = AsyncMock()
+
+    await auth_cog.missing_authentication.callback(auth_cog, context, "csv")
+
+    _, kwargs = context.reply.call_args
+    assert kwargs["file"].filename == "credenciamento.csv"
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.auth.cog.AuthenticationCog._set_attendee_role")
+@patch("pybr2022.auth.cog.AuthenticationCog._log_auth_failed")
+async def test_verify_pending_after_sync(
+    mock_log_auth_failed, mock_set_attendee_role, auth_cog, attendee
+):
+    member = AsyncMock(id=1, roles=["everyone"])
+    auth_cog._guild.fetch_member.return_value = member
+    auth_cog._attendee_role = role = Mock()
+
+    message = AsyncMock(content=attendee.email)
+    message.author.id = 1
+    message.channel.type = ChannelType.private
+    message.author.bot = False
+    await auth_cog.authenticate(message)
+    assert 1 in auth_cog.pending_verifications
+
+    auth_cog.attendees_index.add(attendee)
+    await auth_cog._verify_pending()
+
+    member.add_roles.assert_called_once_with(role)
+    member.send.assert_called_once()
+    assert len(auth_cog.pending_verifications) == 0
+
+
+@pytest.mark.asyncio
+async def test_verify_pending_skips_authenticated(auth_cog, attendee):
+    member = AsyncMock(id=1, roles=["everyone", "attendee"])
+    auth_cog._guild.fetch_member.return_value = member
+    auth_cog._attendee_role = Mock()
+    auth_cog.pending_verifications.record(1, attendee.email.lower())
+    auth_cog.attendees_index.add(attendee)
+
+    await auth_cog._verify_pending()
+
+    member.add_roles.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch(
+    "pybr2022.auth.cog.AuthenticationCog._is_private_message", Mock(return_value=True)
+)
+@patch("pybr2022.auth.cog.AuthenticationCog._get_user_from_server")
+async def test_authenticate_throttled(mock_get_user_from_server, auth_cog):
+    auth_cog._user_limiter = Mock(try_acquire=Mock(return_value=False))
+
+    message = AsyncMock()
+    await auth_cog.authenticate(message)
+    mock_get_user_from_server.assert_not_called()
+    message.author.send.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch(
+    "pybr2022.auth.cog.AuthenticationCog._is_private_message", Mock(return_value=True)
+)
+@patch(
+    "pybr2022.auth.cog.AuthenticationCog._is_auth_needed",
+    AsyncMock(return_value=True),
+)
+@patch("pybr2022.auth.cog.AuthenticationCog._set_attendee_role")
+@patch("pybr2022.auth.cog.AuthenticationCog._log_auth_failed")
+async def test_authenticate_negative_cache(
+    mock_log_auth_failed, mock_set_attendee_role, auth_cog, attendee
+):
+    message = AsyncMock(content=attendee.email)
+
+    await auth_cog.authenticate(message)
+    await auth_cog.authenticate(message)
+    assert message.author.send.call_count == 2
+    mock_log_auth_failed.assert_called_once()
+
+    auth_cog.attendees_index.add(attendee)
+    await auth_cog.authenticate(message)
+    mock_set_attendee_role.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_checkuser_suggestions(auth_cog, attendee):
+    auth_cog.attendees_index.add(attendee)
+    await auth_cog._refresh_fuzzy_index()
+    local, domain = attendee.email.split("@")
+    context = AsyncMock()
+
+    await auth_cog.checkuser.callback(auth_cog, context, f"{local}x@{domain}")
+
+    (reply,), _ = context.reply.call_args
+    assert attendee.email in reply
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.auth.cog.AuthenticationCog._get_channel")
+async def test_log_auth_failed_suggestions(mock_get_channel, auth_cog, attendee):
+    auth_cog.attendees_index.add(attendee)
+    await auth_cog._refresh_fuzzy_index()
+    message = AsyncMock()
+    mock_get_channel.return_value = channel = AsyncMock()
+
+    await auth_cog._log_auth_failed(message, f"x{attendee.email}")
+    await auth_cog.log_sink.flush()
+
+    (log_message,), _ = channel.send.call_args
+    assert attendee.email in log_message
+
+
+@pytest.mark.asyncio
+async def test_refresh_fuzzy_index(auth_cog):
+    first, second = AttendeeFactory.build_batch(2, id=factory.Sequence(str))
+    auth_cog.attendees_index.add(first)
+
+    await auth_cog._refresh_fuzzy_index()
+    fuzzy_index = auth_cog.fuzzy_index
+    assert first.email.lower() in fuzzy_index
+
+    auth_cog.attendees_index.add(second)
+    auth_cog.attendees_index.remove_many([first.id])
+    await auth_cog._refresh_fuzzy_index()
+
+    assert auth_cog.fuzzy_index is fuzzy_index
+    assert list(fuzzy_index._emails) == [second.email.lower()]
+
+
+@pytest.mark.asyncio
+@patch(
+    "pybr2022.auth.cog.AuthenticationCog._is_private_message", Mock(return_value=True)
+)
+@patch(
+    "pybr2022.auth.cog.AuthenticationCog._is_auth_needed",
+    AsyncMock(return_value=True),
+)
+@patch("pybr2022.auth.cog.AuthenticationCog._set_attendee_role")
+async def test_authenticate_metrics(mock_set_attendee_role, auth_cog, attendee):
+    authenticated = metrics.counter("auth_results", result="authenticated")
+    before_count, before_auths = AUTH_TOTAL.count, authenticated.value
+    auth_cog.attendees_index.add(attendee)
+
+    await auth_cog.authenticate(AsyncMock(content=attendee.email))
+
+    assert AUTH_TOTAL.count == before_count + 1
+    assert authenticated.value == before_auths + 1
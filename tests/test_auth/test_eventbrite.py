@@ -1,5 +1,4 @@
 import json
-from asyncio import iscoroutine
 from datetime import datetime
 from pathlib import Path
 from unittest import mock
@@ -9,20 +8,21 @@ import pytest
 
 from pybr2022.auth.eventbrite import EventBrite, EventBriteAPIException
 from pybr2022.auth.models import Attendee
+from pybr2022.ratelimit import RetryPolicy
 
 BASE_DIR = "pybr2022.auth.eventbrite"
 
 
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(RetryPolicy, "backoff", lambda self, attempt: 0)
+
+
 @pytest.fixture
 def datadir(request):
     return request.config.rootpath / "tests" / "data"
 
 
-def _cancel_coroutines(tasks):
-    for task in tasks:
-        task.close()
-
-
 def test_list_attendees_params(datadir):
     eventbrite = EventBrite("event-id", "api-token")
     expected_params = {
@@ -37,9 +37,12 @@ def test_list_attendees_params_next_page():
     expected_params = {
         "token": "api-token",
         "status": "attending",
-        "continuation": "eyJwYWdlIjogMn0=",
+        "continuation": "continuation-token",
     }
-    assert eventbrite._list_attendees_params(page=2) == expected_params
+    assert (
+        eventbrite._list_attendees_params(continuation="continuation-token")
+        == expected_params
+    )
 
 
 def test_list_attendees_params_changed_since():
@@ -56,25 +59,31 @@ def test_list_attendees_params_changed_since():
     )
 
 
-@mock.patch(f"{BASE_DIR}.EventBrite._get_client", mock.Mock())
-def test_prepare_list_attendees_all_pages():
-    expected_params_1 = {
+def test_next_page_params():
+    eventbrite = EventBrite("event-id", "api-token")
+    changed_since = datetime(2002, 6, 30)
+    response = {
+        "pagination": {"has_more_items": True, "continuation": "continuation-token"}
+    }
+    assert eventbrite._next_page_params(response, changed_since) == {
         "token": "api-token",
         "status": "attending",
-        "continuation": "eyJwYWdlIjogMX0=",
+        "continuation": "continuation-token",
+        "changed_since": "2002-06-30T00:00:00Z",
     }
-    expected_params_2 = expected_params_1.copy()
-    expected_params_2["continuation"] = "eyJwYWdlIjogMn0="
-    expected_params_3 = expected_params_1.copy()
-    expected_params_3["continuation"] = "eyJwYWdlIjogM30="
 
-    client = mock.Mock()
+
+def test_next_page_params_last_page():
     eventbrite = EventBrite("event-id", "api-token")
-    tasks = eventbrite._prepare_list_attendees_all_pages(client, 1, 3)
+    response = {"pagination": {"has_more_items": False}}
+    assert eventbrite._next_page_params(response) is None
 
-    assert len(tasks) == 3
-    assert iscoroutine(tasks[0])
-    _cancel_coroutines(tasks)
+
+def test_next_page_params_missing_continuation():
+    eventbrite = EventBrite("event-id", "api-token")
+    response = {"pagination": {"has_more_items": True}}
+    with pytest.raises(EventBriteAPIException):
+        eventbrite._next_page_params(response)
 
 
 @pytest.mark.asyncio
@@ -130,3 +139,104 @@ async def test_list_attendees_multiple_pages(httpx_mock, datadir):
     assert attendees[1] == Attendee(
         "order-id-2", "Attendee", "2", "attendee-2@email.com"
     )
+
+
+@pytest.mark.asyncio
+async def test_iter_attendees_yields_pages(httpx_mock, datadir):
+    data = json.loads((datadir / "event_attendees_first_page.json").read_text())
+    httpx_mock.add_response(json=data)
+    data = json.loads((datadir / "event_attendees_second_page.json").read_text())
+    httpx_mock.add_response(json=data)
+    eventbrite = EventBrite("event-id", "api-token")
+
+    pages = [attendees async for attendees in eventbrite.iter_attendees()]
+
+    assert pages == [
+        [Attendee("order-id-1", "Attendee", "1", "attendee-1@email.com")],
+        [Attendee("order-id-2", "Attendee", "2", "attendee-2@email.com")],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_list_attendees_follows_continuation(httpx_mock, datadir):
+    data = json.loads((datadir / "event_attendees_first_page.json").read_text())
+    httpx_mock.add_response(json=data)
+    data = json.loads((datadir / "event_attendees_second_page.json").read_text())
+    httpx_mock.add_response(json=data)
+    eventbrite = EventBrite("event-id", "api-token")
+
+    await eventbrite.list_attendees(datetime(2002, 6, 30))
+
+    first, second = httpx_mock.get_requests()
+    assert "continuation" not in first.url.params
+    assert second.url.params["continuation"] == "continuation-token-2"
+    assert first.url.params["changed_since"] == "2002-06-30T00:00:00Z"
+    assert second.url.params["changed_since"] == "2002-06-30T00:00:00Z"
+
+
+@pytest.mark.asyncio
+async def test_shared_client():
+    eventbrite = EventBrite("event-id", "api-token")
+    client = eventbrite._get_client()
+    assert eventbrite._get_client() is client
+
+    await eventbrite.aclose()
+    assert client.is_closed
+    assert eventbrite._get_client() is not client
+
+
+@pytest.mark.asyncio
+async def test_list_attendees_retry_server_error(httpx_mock, datadir):
+    data = json.loads((datadir / "event_attendees_single_page.json").read_text())
+    httpx_mock.add_response(status_code=503)
+    httpx_mock.add_response(json=data)
+    eventbrite = EventBrite("event-id", "api-token")
+
+    attendees = await eventbrite.list_attendees()
+
+    assert len(attendees) == 2
+    assert len(httpx_mock.get_requests()) == 2
+
+
+def test_list_attendees_params_all_statuses():
+    eventbrite = EventBrite("event-id", "api-token")
+    assert eventbrite._list_attendees_params(status=None) == {"token": "api-token"}
+
+
+@pytest.mark.asyncio
+async def test_iter_changes(httpx_mock):
+    def attendee(number, **fields):
+        return {
+            "id": str(number),
+            "order_id": f"order-id-{number}",
+            "status": "Attending",
+            "profile": {
+                "first_name": "Attendee",
+                "last_name": str(number),
+                "email": f"attendee-{number}@email.com",
+            },
+            **fields,
+        }
+
+    httpx_mock.add_response(
+        json={
+            "pagination": {"has_more_items": False},
+            "attendees": [
+                attendee(1),
+                attendee(2, status="Checked In"),
+                attendee(3, cancelled=True),
+                attendee(4, refunded=True),
+                attendee(5, status="Transferred"),
+            ],
+        }
+    )
+    eventbrite = EventBrite("event-id", "api-token")
+
+    pages = [page async for page in eventbrite.iter_changes(datetime(2002, 6, 30))]
+
+    [(active, inactive)] = pages
+    assert [attendee.id for attendee in active] == ["1", "2"]
+    assert [attendee.id for attendee in inactive] == ["3", "4", "5"]
+    [request] = httpx_mock.get_requests()
+    assert "status" not in request.url.params
+    assert request.url.params["changed_since"] == "2002-06-30T00:00:00Z"
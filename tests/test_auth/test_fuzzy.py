@@ -0,0 +1,77 @@
+import pytest
+
+from pybr2022.auth.fuzzy import FuzzyEmailIndex, edit_distance, trigrams
+
+
+@pytest.fixture
+def fuzzy_index():
+    index = FuzzyEmailIndex()
+    index.update(
+        [
+            "joao.silva@gmail.com",
+            "maria.souza@hotmail.com",
+            "mariana.souza@hotmail.com",
+            "pedro@empresa.com.br",
+        ]
+    )
+    return index
+
+
+@pytest.mark.parametrize(
+    "a, b, limit, expected",
+    (
+        ("gmail", "gmail", 2, 0),
+        ("gmail", "gmial", 2, 2),
+        ("gmail", "gmai", 2, 1),
+        ("gmail", "yahoo", 2, 3),
+        ("", "abc", 1, 2),
+    ),
+)
+def test_edit_distance(a, b, limit, expected):
+    assert edit_distance(a, b, limit) == expected
+
+
+def test_trigrams():
+    assert trigrams("ab") == {"^ab", "ab$"}
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    (
+        ("joao.silva@gmial.com", "joao.silva@gmail.com"),
+        ("joaosilva@gmail.com", "joao.silva@gmail.com"),
+        ("joao.silva+pybr@gmail.com", "joao.silva@gmail.com"),
+        ("maria.souza@hotmail.con", "maria.souza@hotmail.com"),
+        ("pedro@empresa.com.bt", "pedro@empresa.com.br"),
+        ("Maria.Sousa@hotmail.com", "maria.souza@hotmail.com"),
+    ),
+)
+def test_suggest(query, expected, fuzzy_index):
+    assert fuzzy_index.suggest(query)[0] == expected
+
+
+def test_suggest_nothing_close(fuzzy_index):
+    assert fuzzy_index.suggest("someone.else@example.org") == []
+
+
+def test_suggest_skips_exact_match(fuzzy_index):
+    assert "joao.silva@gmail.com" not in fuzzy_index.suggest("joao.silva@gmail.com")
+
+
+def test_update_only_adds_new_emails(fuzzy_index):
+    assert fuzzy_index.update(["joao.silva@gmail.com", "ana@gmail.com"]) == 1
+    assert len(fuzzy_index) == 5
+    assert "ana@gmail.com" in fuzzy_index
+
+
+def test_common_trigrams_are_not_indexed():
+    index = FuzzyEmailIndex(max_postings=2)
+    index.update(["a1@x.com", "a2@x.com", "a3@x.com"])
+    assert "com" not in index._postings
+    assert "com" in index._common
+
+
+def test_sync_removes_stale_emails(fuzzy_index):
+    assert fuzzy_index.sync(["joao.silva@gmail.com", "ana@gmail.com"]) == (1, 3)
+    assert len(fuzzy_index) == 2
+    assert fuzzy_index.suggest("joao.silva@gmial.com") == ["joao.silva@gmail.com"]
@@ -1,8 +1,14 @@
+import asyncio
 import json
+from dataclasses import asdict
 from datetime import datetime
 from unittest.mock import patch
 
+import factory
+import pytest
+
 from pybr2022.auth.index import AttendeesIndex, AttendeesJSONEncoder
+from tests.test_auth.factories import AttendeeFactory
 
 
 @patch("pybr2022.auth.index.datetime")
@@ -12,9 +18,9 @@ def test_index(mock_datetime, attendees_index, attendee):
 
     attendees_index.add(attendee)
 
-    assert len(attendees_index._index) == 2
-    assert attendees_index.search(attendee.order_id) == attendee
+    assert len(attendees_index._index) == 1
     assert attendees_index.search(attendee.email) == attendee
+    assert attendees_index.search(attendee.order_id) is None
     assert attendees_index.updated_at == now
 
 
@@ -24,8 +30,8 @@ def test_load_cache(tmp_path, attendee):
     cache = {
         "updated_at": now.isoformat(),
         "index": {
-            attendee.order_id: attendee.__dict__,
-            attendee.email: attendee.__dict__,
+            attendee.order_id: asdict(attendee),
+            attendee.email: asdict(attendee),
         },
     }
 
@@ -35,8 +41,8 @@ def test_load_cache(tmp_path, attendee):
 
     index = AttendeesIndex(cache_file, True)
     assert index.updated_at == now
-    assert index.search(attendee.order_id).__dict__ == attendee.__dict__
-    assert index.search(attendee.email).__dict__ == attendee.__dict__
+    assert asdict(index.search(attendee.order_id)) == asdict(attendee)
+    assert asdict(index.search(attendee.email)) == asdict(attendee)
 
 
 @patch("pybr2022.auth.index.datetime")
@@ -48,10 +54,331 @@ def test_store_cache(mock_datetime, attendees_index, attendee):
     with attendees_index._index_path.open(mode="r") as fp:
         data = json.load(fp)
         assert data["updated_at"] == now.isoformat()
-        assert data["index"][attendee.order_id] == attendee.__dict__
-        assert data["index"][attendee.email] == attendee.__dict__
+        assert data["index"] == {attendee.email.lower(): asdict(attendee)}
 
 
 def test_attendees_json_encoder(attendee):
-    assert AttendeesJSONEncoder().default(attendee) == attendee.__dict__
+    assert AttendeesJSONEncoder().default(attendee) == asdict(attendee)
     assert AttendeesJSONEncoder().default("other-type") == None
+
+
+@patch("pybr2022.auth.index.AttendeesIndex._write_cache")
+def test_add_many_single_write(mock_write_cache, attendees_index):
+    attendees = AttendeeFactory.build_batch(10)
+
+    assert attendees_index.add_many(attendees) == 10
+
+    mock_write_cache.assert_called_once()
+    assert len(attendees_index._index) == 10
+    assert attendees_index.search(attendees[-1].email) == attendees[-1]
+
+
+@patch("pybr2022.auth.index.AttendeesIndex._write_cache")
+def test_transaction_single_write(mock_write_cache, attendees_index):
+    attendees = AttendeeFactory.build_batch(3)
+
+    with attendees_index.transaction():
+        for attendee in attendees:
+            attendees_index.add(attendee)
+        mock_write_cache.assert_not_called()
+
+    mock_write_cache.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_add_debounced_flush(attendees_index, attendee):
+    attendees_index.add(attendee)
+    assert not attendees_index._index_path.exists()
+
+    await attendees_index.flush()
+
+    with attendees_index._index_path.open(mode="r") as fp:
+        data = json.load(fp)
+        assert data["index"][attendee.email.lower()] == asdict(attendee)
+    assert not list(attendees_index._index_path.parent.glob("*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_add_debounced_flush_timer(tmp_path, attendee):
+    index = AttendeesIndex(tmp_path / "cache.json", True, flush_delay=0)
+    index.add(attendee)
+
+    await asyncio.sleep(0.1)
+
+    assert index._index_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_flush_waits_for_debounced_flush(tmp_path, attendee):
+    index = AttendeesIndex(tmp_path / "cache.json", True, flush_delay=0)
+    index.add(attendee)
+    while index._flush_task is None:
+        await asyncio.sleep(0)
+    task = index._flush_task
+
+    await index.flush()
+
+    assert task.done()
+    assert index._index_path.exists()
+
+
+def test_journal_append(tmp_path):
+    attendees = AttendeeFactory.build_batch(3)
+    index = AttendeesIndex(tmp_path / "cache.json", True, journal_enabled=True)
+
+    index.add_many(attendees[:2])
+    index.add(attendees[2])
+
+    assert not index._index_path.exists()
+    lines = index._journal_path.read_text().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[2])["attendee"] == asdict(attendees[2])
+
+
+def test_journal_replay(tmp_path):
+    attendees = AttendeeFactory.build_batch(3)
+    cache_file = tmp_path / "cache.json"
+    index = AttendeesIndex(cache_file, True, journal_enabled=True)
+    index.add_many(attendees)
+
+    replayed = AttendeesIndex(cache_file, True, journal_enabled=True)
+
+    assert replayed.updated_at == index.updated_at
+    for attendee in attendees:
+        assert replayed.search(attendee.email) == attendee
+
+
+def test_journal_replay_torn_tail(tmp_path):
+    attendee, torn = AttendeeFactory.build_batch(2)
+    cache_file = tmp_path / "cache.json"
+    index = AttendeesIndex(cache_file, True, journal_enabled=True)
+    index.add(attendee)
+    with index._journal_path.open("a") as fp:
+        fp.write('{"updated_at": "2022-')
+
+    replayed = AttendeesIndex(cache_file, True, journal_enabled=True)
+    replayed.add(torn)
+
+    assert replayed.search(attendee.email) == attendee
+    assert len(replayed._journal_path.read_text().splitlines()) == 2
+    assert AttendeesIndex(cache_file, True, journal_enabled=True).search(torn.email)
+
+
+def test_journal_compaction(tmp_path):
+    attendees = AttendeeFactory.build_batch(3)
+    cache_file = tmp_path / "cache.json"
+    index = AttendeesIndex(cache_file, True, journal_enabled=True, compact_threshold=1)
+
+    index.add(attendees[0])
+    assert index._journal_path.exists()
+    index.add(attendees[1])
+    assert not index._journal_path.exists()
+    index.add(attendees[2])
+
+    with cache_file.open() as fp:
+        assert len(json.load(fp)["index"]) == 2
+
+    replayed = AttendeesIndex(cache_file, True, journal_enabled=True)
+    assert len(replayed._index) == 3
+
+
+def test_load_cache_small_chunks(tmp_path):
+    attendees = AttendeeFactory.build_batch(20)
+    cache_file = tmp_path / "cache.json"
+    AttendeesIndex(cache_file, True).add_many(attendees)
+
+    index = AttendeesIndex(cache_file, True, load_chunk_size=7)
+
+    assert len(index._index) == 20
+    for attendee in attendees:
+        assert index.search(attendee.email) == attendee
+
+
+def test_load_cache_empty_index(tmp_path):
+    now = datetime.utcnow()
+    cache_file = tmp_path / "cache.json"
+    cache_file.write_text(json.dumps({"index": {}, "updated_at": now.isoformat()}))
+
+    index = AttendeesIndex(cache_file, True, load_chunk_size=3)
+
+    assert index.loaded
+    assert not index._index
+    assert index.updated_at == now
+
+
+@pytest.mark.asyncio
+async def test_lazy_load(tmp_path):
+    attendees = AttendeeFactory.build_batch(10)
+    cache_file = tmp_path / "cache.json"
+    stored = AttendeesIndex(cache_file, True)
+    stored.add_many(attendees)
+    await stored.flush()
+
+    index = AttendeesIndex(cache_file, True, lazy_load=True, load_batch_size=2)
+    assert not index.loaded
+    assert index.updated_at is None
+
+    index.start_loading()
+    await asyncio.sleep(0)
+    assert 0 < len(index._index) < 10
+    assert index.updated_at is None
+
+    await index.wait_loaded()
+    assert len(index._index) == 10
+    assert index.updated_at == stored.updated_at
+
+
+@pytest.mark.asyncio
+async def test_lazy_load_corrupt_cache(tmp_path, attendee):
+    cache_file = tmp_path / "cache.json"
+    cache_file.write_text('{"updated_at": "2022-10-01T00:00:00", "index": {"a@b.com')
+    index = AttendeesIndex(cache_file, True, journal_enabled=True, lazy_load=True)
+
+    index.start_loading()
+    await asyncio.wait_for(index.wait_loaded(), 1)
+
+    assert not index._index
+    assert index.updated_at is None
+    index.add(attendee)
+    await index.flush()
+    assert not index._journal_path.exists()
+    assert AttendeesIndex(cache_file, True).search(attendee.email) == attendee
+
+
+def test_membership_only(tmp_path, attendee):
+    cache_file = tmp_path / "cache.json"
+    index = AttendeesIndex(cache_file, True, membership_only=True)
+    index.add(attendee)
+
+    assert attendee.email.upper() in index
+    assert "other@email.com" not in index
+    assert index.search(attendee.email) is None
+    assert len(index) == 1
+
+    with cache_file.open() as fp:
+        assert json.load(fp)["index"] == {attendee.email.lower(): None}
+    assert attendee.email in AttendeesIndex(cache_file, True, membership_only=True)
+
+
+def test_membership_only_from_full_cache(tmp_path, attendee):
+    cache_file = tmp_path / "cache.json"
+    AttendeesIndex(cache_file, True, journal_enabled=True).add(attendee)
+
+    index = AttendeesIndex(cache_file, True, journal_enabled=True, membership_only=True)
+
+    assert attendee.email in index
+    assert index._index[attendee.email.lower()] is None
+
+
+def test_add_many_skips_unchanged(tmp_path):
+    attendees = AttendeeFactory.build_batch(3, id=factory.Sequence(str))
+    index = AttendeesIndex(tmp_path / "cache.json", True, journal_enabled=True)
+    index.add_many(attendees)
+    version = index.version
+
+    assert index.add_many(attendees) == 3
+
+    assert index.version == version
+    assert len(index._journal_path.read_text().splitlines()) == 3
+
+
+def test_add_email_changed(attendees_index):
+    attendee = AttendeeFactory.build(id="1")
+    attendees_index.add(attendee)
+
+    changed = AttendeeFactory.build(id="1")
+    attendees_index.add(changed)
+
+    assert attendee.email not in attendees_index
+    assert attendees_index.search(changed.email) == changed
+    assert attendees_index._ids == {"1": changed.email.lower()}
+
+
+def test_remove_many(attendees_index):
+    kept, removed = AttendeeFactory.build_batch(2, id=factory.Sequence(str))
+    attendees_index.add_many([kept, removed])
+    version = attendees_index.version
+
+    assert attendees_index.remove_many([removed.id, "unknown"]) == 1
+
+    assert removed.email not in attendees_index
+    assert kept.email in attendees_index
+    assert attendees_index.version > version
+
+
+def test_remove_shared_email(attendees_index):
+    first = AttendeeFactory.build(id="1", email="shared@email.com")
+    second = AttendeeFactory.build(id="2", email="shared@email.com")
+    attendees_index.add_many([first, second])
+
+    attendees_index.remove_many(["2"])
+
+    assert attendees_index.search("shared@email.com").id == "1"
+    attendees_index.remove_many(["1"])
+    assert "shared@email.com" not in attendees_index
+    assert not attendees_index._shared
+
+
+def test_retain(attendees_index):
+    kept, removed = AttendeeFactory.build_batch(2, id=factory.Sequence(str))
+    legacy = AttendeeFactory.build()
+    attendees_index.add_many([kept, removed, legacy])
+
+    assert attendees_index.retain({kept.id}) == 2
+
+    assert list(attendees_index.keys()) == [kept.email.lower()]
+
+
+def test_journal_replay_removals(tmp_path):
+    attendees = AttendeeFactory.build_batch(3, id=factory.Sequence(str))
+    cache_file = tmp_path / "cache.json"
+    index = AttendeesIndex(cache_file, True, journal_enabled=True)
+    index.add_many(attendees)
+    index.remove_many([attendees[0].id])
+    index.add(AttendeeFactory.build(id=attendees[1].id, email="new@email.com"))
+
+    replayed = AttendeesIndex(cache_file, True, journal_enabled=True)
+
+    assert set(replayed.keys()) == {"new@email.com", attendees[2].email.lower()}
+    assert replayed._ids == index._ids
+
+
+def test_membership_only_keeps_ids(tmp_path):
+    attendee = AttendeeFactory.build(id="1")
+    cache_file = tmp_path / "cache.json"
+    AttendeesIndex(cache_file, True, membership_only=True).add(attendee)
+
+    index = AttendeesIndex(cache_file, True, membership_only=True)
+    assert index.search(attendee.email) is None
+    assert index.remove_many(["1"]) == 1
+    assert attendee.email not in index
+
+
+@pytest.mark.parametrize("journal_enabled", (False, True))
+def test_shared_email_survives_restart(tmp_path, journal_enabled):
+    first = AttendeeFactory.build(id="1", email="shared@email.com")
+    second = AttendeeFactory.build(id="2", email="shared@email.com")
+    cache_file = tmp_path / "cache.json"
+    index = AttendeesIndex(cache_file, True, journal_enabled=journal_enabled)
+    index.add_many([first, second])
+
+    restarted = AttendeesIndex(cache_file, True, journal_enabled=journal_enabled)
+
+    assert restarted._ids == {"1": "shared@email.com", "2": "shared@email.com"}
+    assert restarted._shared == {"shared@email.com": {"1", "2"}}
+    restarted.remove_many(["2"])
+    assert "shared@email.com" in restarted
+    restarted.remove_many(["1"])
+    assert "shared@email.com" not in restarted
+
+
+def test_add_many_shared_email_unchanged(attendees_index):
+    first = AttendeeFactory.build(id="1", email="shared@email.com")
+    second = AttendeeFactory.build(id="2", email="shared@email.com")
+    attendees_index.add_many([first, second])
+    version = attendees_index.version
+
+    attendees_index.add_many([first, second])
+    attendees_index.add_many([first, second])
+
+    assert attendees_index.version == version
@@ -0,0 +1,97 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from pybr2022.auth import logsink
+from pybr2022.auth.logsink import MESSAGE_MAX_LENGTH, BatchedLogSink
+
+
+def sink_for(channel, **kwargs):
+    async def get_channel():
+        return channel
+
+    return BatchedLogSink(get_channel, **kwargs)
+
+
+async def stop(sink):
+    sink.stop()
+    await asyncio.gather(sink._task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_flush_combines_records():
+    channel = AsyncMock()
+    sink = sink_for(channel)
+    sink.add("first")
+    sink.add("second")
+
+    assert await sink.flush() == 2
+    channel.send.assert_called_once_with("first\n\nsecond")
+    assert await sink.flush() == 0
+    assert len(sink) == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_large_batch_as_file():
+    channel = AsyncMock()
+    sink = sink_for(channel)
+    for _ in range(3):
+        sink.add("x" * MESSAGE_MAX_LENGTH)
+
+    await sink.flush()
+    _, kwargs = channel.send.call_args
+    assert kwargs["file"].filename == "logs.md"
+
+
+@pytest.mark.asyncio
+async def test_flush_failure_requeues():
+    channel = AsyncMock()
+    channel.send.side_effect = RuntimeError
+    sink = sink_for(channel, max_buffer=2)
+    sink.add("first")
+    sink.add("second")
+    await sink.flush()
+
+    sink.add("third")
+    assert sink._records == ["second", "third"]
+    await sink.flush()
+    assert sink._records == ["second", "third"]
+
+
+def test_add_drops_oldest_over_max_buffer():
+    sink = sink_for(AsyncMock(), max_records=10, max_buffer=2)
+    for record in ("first", "second", "third"):
+        sink.add(record)
+
+    assert sink._records == ["second", "third"]
+
+
+@pytest.mark.asyncio
+async def test_run_flushes_when_full():
+    channel = AsyncMock()
+    sink = sink_for(channel, flush_interval=60, max_records=2)
+    sink.start()
+    sink.add("first")
+    sink.add("second")
+    await asyncio.sleep(0.01)
+    await stop(sink)
+
+    channel.send.assert_called_once_with("first\n\nsecond")
+
+
+@pytest.mark.asyncio
+async def test_run_waits_while_busy(monkeypatch):
+    monkeypatch.setattr(logsink, "BUSY_POLL_INTERVAL", 0.001)
+    channel = AsyncMock()
+    busy = True
+    sink = sink_for(channel, flush_interval=0, busy=lambda: busy)
+    sink.start()
+    sink.add("record")
+    await asyncio.sleep(0.01)
+    channel.send.assert_not_called()
+
+    busy = False
+    await asyncio.sleep(0.05)
+    await stop(sink)
+    channel.send.assert_called_once()
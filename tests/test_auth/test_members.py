@@ -0,0 +1,53 @@
+import csv
+import io
+from datetime import datetime
+from tempfile import TemporaryFile
+from unittest.mock import Mock
+
+from pybr2022.auth.members import CSV_HEADER, MemberTracker, write_members_csv
+
+
+def member(id, roles=1):
+    return Mock(id=id, roles=["role"] * roles)
+
+
+def test_member_tracker():
+    tracker = MemberTracker()
+    tracker.update(member(1))
+    tracker.update(member(2))
+    tracker.update(member(3, roles=2))
+    assert len(tracker) == 2
+    assert 1 in tracker
+    assert 3 not in tracker
+
+    tracker.update(member(1, roles=2))
+    tracker.remove(member(2))
+    assert len(tracker) == 0
+
+
+def test_member_tracker_reset():
+    tracker = MemberTracker()
+    tracker.update(member(1))
+    tracker.ready = True
+
+    tracker.reset()
+    assert not tracker.ready
+    assert len(tracker) == 0
+
+
+def test_write_members_csv():
+    known = Mock(display_name="Known", joined_at=datetime(2022, 10, 1))
+    known.__str__ = Mock(return_value="known#0001")
+    guild = Mock()
+    guild.get_member = lambda member_id: known if member_id == 1 else None
+
+    with TemporaryFile() as fp:
+        assert write_members_csv([1, 2], guild, fp) == 2
+        fp.seek(0)
+        rows = list(csv.reader(io.TextIOWrapper(fp, encoding="utf-8")))
+
+    assert rows == [
+        list(CSV_HEADER),
+        ["1", "known#0001", "Known", "2022-10-01T00:00:00"],
+        ["2", "", "", ""],
+    ]
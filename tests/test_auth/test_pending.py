@@ -0,0 +1,36 @@
+from pybr2022.auth.pending import PendingVerifications
+
+
+def test_record_keeps_last_email():
+    pending = PendingVerifications()
+    pending.record(1, "old@example.com")
+    pending.record(1, "new@example.com")
+    pending.record(2, "new@example.com")
+
+    assert len(pending) == 2
+    assert pending.match({"old@example.com": None}.keys()) == {}
+    assert pending.match({"new@example.com": None}.keys()) == {
+        1: "new@example.com",
+        2: "new@example.com",
+    }
+    assert len(pending) == 0
+
+
+def test_discard():
+    pending = PendingVerifications()
+    pending.record(1, "a@example.com")
+    pending.discard(1)
+    pending.discard(2)
+
+    assert 1 not in pending
+    assert pending.match({"a@example.com": None}.keys()) == {}
+
+
+def test_max_entries_drops_oldest():
+    pending = PendingVerifications(max_entries=2)
+    pending.record(1, "a@example.com")
+    pending.record(2, "b@example.com")
+    pending.record(3, "c@example.com")
+
+    assert 1 not in pending
+    assert 2 in pending and 3 in pending
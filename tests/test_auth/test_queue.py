@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from pybr2022.auth.queue import QUEUE_WAIT, AuthQueue
+
+
+@pytest.mark.asyncio
+async def test_auth_queue_bounded_concurrency():
+    running = 0
+    max_running = 0
+
+    async def handler(item):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    queue = AuthQueue(handler, workers=2)
+    queue.start()
+    for user_id in range(6):
+        assert queue.submit(user_id, user_id)
+
+    await queue.join()
+    queue.stop()
+
+    assert max_running == 2
+    assert queue.stats.processed == 6
+    assert queue.stats.max_depth == 6
+
+
+@pytest.mark.asyncio
+async def test_auth_queue_deduplicates_waiting_users():
+    handled = []
+
+    async def handler(item):
+        handled.append(item)
+
+    queue = AuthQueue(handler, workers=1)
+    queue.submit(1, "first")
+    queue.submit(1, "second")
+    queue.start()
+
+    await queue.join()
+    queue.stop()
+
+    assert handled == ["second"]
+    assert queue.stats.deduplicated == 1
+
+
+@pytest.mark.asyncio
+async def test_auth_queue_keeps_queued_item():
+    handled = []
+
+    async def handler(item):
+        handled.append(item)
+
+    queue = AuthQueue(handler, workers=1, replaces=lambda queued, new: False)
+    queue.submit(1, "first")
+    queue.submit(1, "second")
+    queue.start()
+
+    await queue.join()
+    queue.stop()
+
+    assert handled == ["first"]
+
+
+@pytest.mark.asyncio
+async def test_auth_queue_serializes_same_user():
+    handled = []
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def handler(item):
+        started.set()
+        await release.wait()
+        handled.append(item)
+
+    queue = AuthQueue(handler, workers=2)
+    queue.start()
+    queue.submit(1, "first")
+    await started.wait()
+
+    queue.submit(1, "second")
+    await asyncio.sleep(0)
+    assert queue.active == 1
+
+    release.set()
+    await queue.join()
+    queue.stop()
+
+    assert handled == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_auth_queue_full_and_failures():
+    async def handler(item):
+        raise ValueError(item)
+
+    queue = AuthQueue(handler, workers=1, max_size=1)
+    assert queue.submit(1, "a")
+    assert not queue.submit(2, "b")
+    assert queue.stats.rejected == 1
+
+    queue.start()
+    await queue.join()
+    queue.stop()
+
+    assert queue.stats.failed == 1
+    assert queue.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_auth_queue_records_wait_time():
+    async def handler(item):
+        pass
+
+    before = QUEUE_WAIT.count
+    queue = AuthQueue(handler, workers=1)
+    queue.submit(1, "first")
+    queue.submit(1, "second")
+    queue.start()
+    await queue.join()
+    queue.stop()
+
+    assert QUEUE_WAIT.count == before + 1
@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+from pybr2022.auth.throttle import NegativeCache, UserRateLimiter
+
+
+def test_user_rate_limiter():
+    limiter = UserRateLimiter(rate=0.001, capacity=2)
+    assert limiter.try_acquire(1)
+    assert limiter.try_acquire(1)
+    assert not limiter.try_acquire(1)
+    assert limiter.try_acquire(2)
+
+
+def test_user_rate_limiter_drops_least_recent():
+    limiter = UserRateLimiter(rate=0.001, capacity=1, max_users=2)
+    limiter.try_acquire(1)
+    limiter.try_acquire(2)
+    limiter.try_acquire(1)
+    limiter.try_acquire(3)
+
+    assert len(limiter) == 2
+    assert 2 not in limiter._buckets
+
+
+def test_user_rate_limiter_refills():
+    limiter = UserRateLimiter(rate=0.5, capacity=1)
+    with patch("pybr2022.auth.throttle.time.monotonic", return_value=100):
+        assert limiter.try_acquire(1)
+        assert not limiter.try_acquire(1)
+    with patch("pybr2022.auth.throttle.time.monotonic", return_value=102):
+        assert limiter.try_acquire(1)
+
+
+def test_negative_cache():
+    cache = NegativeCache(ttl=10)
+    cache.add((1, "a@example.com"), version=1)
+
+    assert cache.hit((1, "a@example.com"), version=1)
+    assert not cache.hit((2, "a@example.com"), version=1)
+    assert cache.hits == 1
+
+
+def test_negative_cache_new_version_invalidates():
+    cache = NegativeCache(ttl=10)
+    cache.add((1, "a@example.com"), version=1)
+
+    assert not cache.hit((1, "a@example.com"), version=2)
+    assert len(cache) == 0
+
+
+def test_negative_cache_ttl():
+    cache = NegativeCache(ttl=10)
+    with patch("pybr2022.auth.throttle.time.monotonic", return_value=100):
+        cache.add((1, "a@example.com"), version=1)
+    with patch("pybr2022.auth.throttle.time.monotonic", return_value=111):
+        assert not cache.hit((1, "a@example.com"), version=1)
@@ -0,0 +1,62 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from discord import ChannelType, Intents
+from discord.ext import commands
+
+from pybr2022.bot import Bot, build_intents, is_private_message
+
+
+def message(bot=False, type=ChannelType.private):
+    message = Mock()
+    message.author.bot = bot
+    message.channel.type = type
+    return message
+
+
+def test_build_intents():
+    intents = build_intents()
+    assert intents.members
+    assert intents.dm_messages
+    assert intents.guild_messages
+    assert intents.message_content
+    assert not intents.presences
+    assert not intents.typing
+    assert intents.value < Intents.all().value
+
+
+@pytest.mark.parametrize(
+    "bot, type, expected",
+    (
+        (False, ChannelType.private, True),
+        (True, ChannelType.private, False),
+        (False, ChannelType.text, False),
+    ),
+)
+def test_is_private_message(bot, type, expected):
+    assert is_private_message(message(bot, type)) == expected
+
+
+@pytest.mark.parametrize(
+    "bot, type, events",
+    (
+        (False, ChannelType.private, ["message", "private_message"]),
+        (True, ChannelType.private, ["message"]),
+        (False, ChannelType.text, ["message"]),
+    ),
+)
+@patch.object(commands.Bot, "dispatch")
+def test_dispatch_private_message(mock_dispatch, bot, type, events):
+    client = Bot(command_prefix="pybr!", intents=build_intents())
+    msg = message(bot, type)
+
+    client.dispatch("message", msg)
+
+    assert [call.args[0] for call in mock_dispatch.call_args_list] == events
+
+
+@patch.object(commands.Bot, "dispatch")
+def test_dispatch_other_events(mock_dispatch):
+    client = Bot(command_prefix="pybr!", intents=build_intents())
+    client.dispatch("member_join", Mock())
+    mock_dispatch.assert_called_once()
@@ -0,0 +1,110 @@
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+
+from pybr2022.http import (
+    ClientSettings,
+    ConnectionStats,
+    ResponseCache,
+    build_client,
+    request_with_retry,
+)
+from pybr2022.ratelimit import RetryPolicy, TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_connection_stats(httpx_mock):
+    httpx_mock.add_response()
+    stats = ConnectionStats()
+    client = build_client(ClientSettings(), stats)
+
+    await client.get("https://example.com")
+    request = httpx_mock.get_request()
+    await request.extensions["trace"]("connection.connect_tcp.complete", {})
+    await request.extensions["trace"]("connection.start_tls.complete", {})
+    await client.get("https://example.com")
+    await client.aclose()
+
+    assert stats.requests == 2
+    assert stats.connections == 1
+    assert stats.tls_handshakes == 1
+    assert stats.reused == 1
+
+
+@pytest.mark.asyncio
+async def test_http2_without_h2(monkeypatch):
+    monkeypatch.setattr("pybr2022.http.h2", None)
+    client = build_client(ClientSettings(http2=True), ConnectionStats())
+    await client.aclose()
+
+
+@pytest.fixture
+def limiter():
+    return TokenBucket(rate=1000, capacity=1000)
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.http.asyncio.sleep")
+async def test_request_with_retry_retry_after(mock_sleep, httpx_mock, limiter):
+    httpx_mock.add_response(status_code=429, headers={"Retry-After": "7"})
+    httpx_mock.add_response(json={})
+    client = build_client(ClientSettings(), ConnectionStats())
+    limiter.block_for = Mock()
+
+    response = await request_with_retry(
+        client, "https://example.com", limiter, RetryPolicy()
+    )
+
+    assert response.status_code == 200
+    mock_sleep.assert_called_once_with(7)
+    limiter.block_for.assert_called_once_with(7)
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.http.asyncio.sleep")
+async def test_request_with_retry_timeout(mock_sleep, httpx_mock, limiter):
+    httpx_mock.add_exception(httpx.ReadTimeout("timeout"))
+    client = build_client(ClientSettings(), ConnectionStats())
+
+    with pytest.raises(httpx.ReadTimeout):
+        await request_with_retry(
+            client, "https://example.com", limiter, RetryPolicy(max_attempts=3)
+        )
+
+    assert mock_sleep.call_count == 2
+
+
+@pytest.mark.asyncio
+@patch("pybr2022.http.asyncio.sleep")
+async def test_request_with_retry_gives_up(mock_sleep, httpx_mock, limiter):
+    httpx_mock.add_response(status_code=500)
+    client = build_client(ClientSettings(), ConnectionStats())
+
+    response = await request_with_retry(
+        client, "https://example.com", limiter, RetryPolicy(max_attempts=2)
+    )
+
+    assert response.status_code == 500
+    assert len(httpx_mock.get_requests()) == 2
+
+
+def test_response_cache():
+    cache = ResponseCache(max_entries=1)
+    key = cache.key("https://example.com", {"limit": 100})
+    assert key == "https://example.com?limit=100"
+
+    entry = cache.store(key, httpx.Response(200, json={}, headers={"ETag": "1"}))
+    assert entry.validators() == {"If-None-Match": "1"}
+    assert cache.get(key) is entry
+
+    cache.store("other", httpx.Response(200, json={}, headers={"ETag": "2"}))
+    assert cache.get(key) is None
+    assert len(cache) == 1
+
+
+def test_response_cache_without_validators():
+    cache = ResponseCache()
+    entry = cache.store("key", httpx.Response(200, json={"data": 1}))
+    assert entry.data == {"data": 1}
+    assert cache.get("key") is None
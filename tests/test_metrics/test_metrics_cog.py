@@ -0,0 +1,45 @@
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+
+from pybr2022.metrics import MetricsRegistry
+from pybr2022.metrics.cog import MetricsCog
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    registry.inc("results", result="ok")
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_show_metrics(registry):
+    cog = MetricsCog(AsyncMock(), registry=registry)
+    context = AsyncMock()
+
+    await cog.show_metrics.callback(cog, context)
+
+    context.reply.assert_called_once_with('```\nresults{result="ok"} 1\n```')
+
+
+@pytest.mark.asyncio
+async def test_endpoint_disabled_by_default(registry):
+    cog = MetricsCog(AsyncMock(), registry=registry)
+    await cog.cog_load()
+    assert cog._runner is None
+
+
+@pytest.mark.asyncio
+async def test_prometheus_endpoint(registry, unused_tcp_port):
+    cog = MetricsCog(AsyncMock(), port=unused_tcp_port, registry=registry)
+    await cog.cog_load()
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"http://127.0.0.1:{unused_tcp_port}/metrics")
+    finally:
+        await cog.cog_unload()
+
+    assert response.status_code == 200
+    assert 'pybr2022_results_total{result="ok"} 1' in response.text
@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+import pytest
+
+from pybr2022.metrics import Histogram, MetricsRegistry
+
+
+@pytest.mark.parametrize("micros", (0, 1, 7, 8, 15, 16, 1000, 123_456, 10**7))
+def test_histogram_bucket_bounds(micros):
+    bucket = Histogram.bucket(micros)
+    assert micros < Histogram.upper_bound(bucket)
+    assert bucket == 0 or micros >= Histogram.upper_bound(bucket - 1)
+    # At most 12.5% above the recorded value.
+    assert Histogram.upper_bound(bucket) <= max(micros * 1.125, micros + 1)
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for millis in range(1, 101):
+        histogram.record(millis / 1000)
+
+    assert histogram.count == 100
+    assert histogram.sum == pytest.approx(5.05)
+    assert histogram.percentile(50) == pytest.approx(0.050, rel=0.125)
+    assert histogram.percentile(99) == pytest.approx(0.099, rel=0.125)
+    assert Histogram().percentile(50) == 0
+
+
+def test_timer():
+    registry = MetricsRegistry()
+    with patch("pybr2022.metrics.time.perf_counter", side_effect=[1.0, 1.5]):
+        with registry.timer("stage_seconds", stage="regex"):
+            pass
+
+    histogram = registry.histogram("stage_seconds", stage="regex")
+    assert histogram.count == 1
+    assert histogram.sum == 0.5
+
+
+def test_counters_by_labels():
+    registry = MetricsRegistry()
+    registry.inc("results", result="ok")
+    registry.inc("results", 2, result="ok")
+    registry.inc("results", result="failed")
+
+    assert registry.counter("results", result="ok").value == 3
+    assert registry.counter("results", result="failed").value == 1
+
+
+def test_render_prometheus():
+    registry = MetricsRegistry(prefix="bot")
+    registry.inc("results", result="ok")
+    registry.histogram("request_seconds", upstream="pretalx").record(0.000010)
+
+    assert registry.render_prometheus().splitlines() == [
+        "# TYPE bot_results_total counter",
+        'bot_results_total{result="ok"} 1',
+        "# TYPE bot_request_seconds histogram",
+        'bot_request_seconds_bucket{upstream="pretalx",le="1.1e-05"} 1',
+        'bot_request_seconds_bucket{upstream="pretalx",le="+Inf"} 1',
+        'bot_request_seconds_sum{upstream="pretalx"} 1e-05',
+        'bot_request_seconds_count{upstream="pretalx"} 1',
+    ]
+
+
+def test_summary():
+    registry = MetricsRegistry()
+    registry.inc("results")
+    registry.histogram("auth_seconds").record(0.002)
+
+    assert registry.summary() == [
+        "results 1",
+        "auth_seconds count=1 p50=2.0ms p90=2.0ms p99=2.0ms",
+    ]
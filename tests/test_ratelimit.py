@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import patch
+
+import pytest
+
+from pybr2022.ratelimit import RetryPolicy, TokenBucket, parse_retry_after
+
+
+def test_token_bucket_try_acquire():
+    bucket = TokenBucket(rate=0.001, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_token_bucket_refill():
+    bucket = TokenBucket(rate=10, capacity=1)
+    with patch("pybr2022.ratelimit.time.monotonic") as mock_monotonic:
+        mock_monotonic.return_value = bucket._updated_at
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        mock_monotonic.return_value += 0.2
+        assert bucket.try_acquire()
+
+
+def test_token_bucket_block_for():
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.block_for(60)
+    assert not bucket.try_acquire()
+
+
+@pytest.mark.parametrize(
+    "headers, blocked",
+    (
+        ({}, False),
+        ({"x-ratelimit-remaining": "10", "x-ratelimit-reset": "60"}, False),
+        ({"x-ratelimit-remaining": "0", "x-ratelimit-reset": "60"}, True),
+        ({"x-ratelimit-remaining": "0", "x-ratelimit-reset": "invalid"}, False),
+    ),
+)
+def test_token_bucket_update_from_headers(headers, blocked):
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.update_from_headers(headers)
+    assert bucket.try_acquire() != blocked
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_acquire_waits():
+    bucket = TokenBucket(rate=100, capacity=1)
+    await bucket.acquire()
+    await bucket.acquire()
+    assert bucket._tokens < 1
+
+
+def test_retry_policy_backoff():
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+    for attempt in range(10):
+        assert 0 <= policy.backoff(attempt) <= min(5, 2**attempt)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({}) is None
+    assert parse_retry_after({"retry-after": "12"}) == 12
+    assert parse_retry_after({"retry-after": "invalid"}) is None
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    seconds = parse_retry_after({"retry-after": format_datetime(retry_at)})
+    assert 25 < seconds <= 30
@@ -0,0 +1,18 @@
+import os
+
+# pybr2022.config reads these at import time.
+for name, value in {
+    "DISCORD_TOKEN": "discord-token",
+    "DISCORD_SERVER_ID": "1",
+    "DISCORD_ATTENTEE_ROLE_NAME": "attendee-role-name",
+    "DISCORD_WELCOME_CHANNEL": "welcome",
+    "EVENTBRITE_TOKEN": "eventbrite-token",
+    "EVENTBRITE_EVENT_ID": "event-id",
+    "PRETALX_EVENT_SLUT": "event-slug",
+    "PRETALX_TOKEN": "pretalx-token",
+    "DISCORD_ROOM_KEYNOTE": "100",
+    "DISCORD_ROOM_ARUANA": "101",
+    "DISCORD_ROOM_TUCUNARE": "102",
+    "DISCORD_ROOM_JARAQUI": "103",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+import factory
+
+from pybr2022.talks.models import MANAUS_TZ_OFFSET, Talk
+
+
+class TalkFactory(factory.Factory):
+    class Meta:
+        model = Talk
+        rename = {"room": "_room"}
+
+    title = factory.Faker("sentence")
+    speaker = factory.Faker("name")
+    start = factory.LazyFunction(lambda: datetime.now(tz=MANAUS_TZ_OFFSET))
+    end = factory.LazyAttribute(lambda talk: talk.start)
+    type = "Palestra"
+    room = "Aruanã"
+    youtube = factory.Faker("url")
+    pretalx = factory.Sequence(lambda n: f"https://pretalx.com/talk/{n}")
@@ -0,0 +1,86 @@
+import pytest
+
+from pybr2022.talks.pretalx import Pretalx, PretalxAPIException
+
+URL = "https://pretalx.com/api/events/event-slug/talks/?limit=100"
+
+
+def talk_data(code: str) -> dict:
+    return {
+        "code": code,
+        "title": f"Talk {code}",
+        "speakers": [{"name": "Speaker"}],
+        "slot": {
+            "room": {"pt-BR": "Aruanã - Vasco Vasquez"},
+            "start": "2022-10-20T10:00:00-04:00",
+            "end": "2022-10-20T10:30:00-04:00",
+        },
+        "submission_type": {"pt-BR": "Palestra"},
+        "description": "Link: https://youtube.com/watch",
+    }
+
+
+@pytest.mark.asyncio
+async def test_talks(httpx_mock):
+    httpx_mock.add_response(
+        url=URL, json={"results": [talk_data("AAA")], "next": f"{URL}&offset=100"}
+    )
+    httpx_mock.add_response(
+        url=f"{URL}&offset=100", json={"results": [talk_data("BBB")], "next": None}
+    )
+    pretalx = Pretalx("event-slug", "api-token")
+
+    talks = await pretalx.talks()
+
+    assert [talk.title for talk in talks] == ["Talk AAA", "Talk BBB"]
+    assert talks[0].room == "Aruanã"
+
+
+@pytest.mark.asyncio
+async def test_talks_not_modified(httpx_mock):
+    httpx_mock.add_response(
+        url=URL,
+        json={"results": [talk_data("AAA")], "next": None},
+        headers={"ETag": '"v1"'},
+    )
+    pretalx = Pretalx("event-slug", "api-token")
+    first = await pretalx.talks()
+
+    httpx_mock.reset(assert_all_responses_were_requested=True)
+    httpx_mock.add_response(
+        url=URL, status_code=304, match_headers={"If-None-Match": '"v1"'}
+    )
+    second = await pretalx.talks()
+
+    assert second[0] is first[0]
+    assert pretalx._cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_talks_modified(httpx_mock):
+    httpx_mock.add_response(
+        url=URL,
+        json={"results": [talk_data("AAA")], "next": None},
+        headers={"ETag": '"v1"'},
+    )
+    httpx_mock.add_response(
+        url=URL,
+        json={"results": [talk_data("BBB")], "next": None},
+        headers={"ETag": '"v2"'},
+    )
+    pretalx = Pretalx("event-slug", "api-token")
+    await pretalx.talks()
+
+    talks = await pretalx.talks()
+
+    assert [talk.title for talk in talks] == ["Talk BBB"]
+    assert pretalx._cache.get(URL).etag == '"v2"'
+
+
+@pytest.mark.asyncio
+async def test_talks_error(httpx_mock):
+    httpx_mock.add_response(url=URL, status_code=404)
+    pretalx = Pretalx("event-slug", "api-token")
+
+    with pytest.raises(PretalxAPIException):
+        await pretalx.talks()
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from pybr2022.talks.models import MANAUS_TZ_OFFSET
+from pybr2022.talks.schedule import ANNOUNCED_TALK_TYPES, Schedule
+from tests.test_talks.factories import TalkFactory
+
+NOW = datetime(2022, 10, 20, 10, 0, tzinfo=MANAUS_TZ_OFFSET)
+
+
+def at(minutes: int) -> datetime:
+    return NOW + timedelta(minutes=minutes)
+
+
+@pytest.fixture
+def talks():
+    return [
+        TalkFactory.build(title="late", start=at(45)),
+        TalkFactory.build(title="started", start=at(-5)),
+        TalkFactory.build(title="now", start=NOW),
+        TalkFactory.build(title="soon", start=at(10), room="Jaraqui"),
+        TalkFactory.build(title="tutorial", start=at(15), type="Tutorial"),
+        TalkFactory.build(title="Keynote", start=at(20), type="Keynote"),
+        TalkFactory.build(title="edge", start=at(30)),
+    ]
+
+
+def titles(talks):
+    return [talk.title for talk in talks]
+
+
+def test_upcoming(talks):
+    schedule = Schedule(talks)
+    assert titles(schedule.upcoming(30, now=NOW)) == [
+        "soon",
+        "tutorial",
+        "Keynote",
+    ]
+
+
+def test_upcoming_per_type(talks):
+    schedule = Schedule(talks)
+    upcoming = schedule.upcoming(30, types=ANNOUNCED_TALK_TYPES, now=NOW)
+    assert titles(upcoming) == ["soon", "Keynote"]
+
+
+@pytest.mark.parametrize(
+    "room, expected",
+    (
+        ("jaraqui", ["soon"]),
+        ("KEYNOTE", ["Keynote"]),
+        ("aruanã", ["tutorial"]),
+        ("unknown", []),
+    ),
+)
+def test_upcoming_per_room(room, expected, talks):
+    schedule = Schedule(talks)
+    assert titles(schedule.upcoming(30, room=room, now=NOW)) == expected
+
+
+def test_upcoming_per_room_and_type(talks):
+    schedule = Schedule(talks)
+    upcoming = schedule.upcoming(30, room="aruanã", types=ANNOUNCED_TALK_TYPES, now=NOW)
+    assert upcoming == []
+
+
+def test_is_built_from(talks):
+    schedule = Schedule(talks)
+    assert schedule.is_built_from(list(reversed(talks)))
+    assert not schedule.is_built_from(talks[1:])
+    assert not schedule.is_built_from([TalkFactory.build() for _ in talks])
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+
+from pybr2022.talks.models import MANAUS_TZ_OFFSET
+from pybr2022.talks.schedule import Schedule
+from pybr2022.talks.scheduler import RETRY_DELAY, AnnouncementScheduler
+from tests.test_talks.factories import TalkFactory
+
+NOW = datetime(2022, 10, 20, 10, 0, tzinfo=MANAUS_TZ_OFFSET)
+
+
+def at(minutes: int) -> datetime:
+    return NOW + timedelta(minutes=minutes)
+
+
+@pytest.fixture
+def publish():
+    return AsyncMock(side_effect=lambda talks, **kwargs: talks)
+
+
+@pytest.fixture
+def scheduler(publish):
+    return AnnouncementScheduler(publish, timedelta(minutes=10))
+
+
+def test_sync(scheduler):
+    schedule = Schedule(
+        [
+            TalkFactory.build(start=at(-5)),
+            TalkFactory.build(start=at(30)),
+            TalkFactory.build(start=at(60), type="Tutorial"),
+        ]
+    )
+    scheduler.sync(schedule, now=NOW)
+    assert len(scheduler) == 1
+
+
+@pytest.mark.asyncio
+async def test_run_due(scheduler, publish):
+    first = TalkFactory.build(start=at(5))
+    second = TalkFactory.build(start=at(30))
+    third = TalkFactory.build(start=at(30))
+    scheduler.sync(Schedule([first, second, third]), now=NOW)
+
+    assert await scheduler.run_due(now=NOW) == 20 * 60
+    publish.assert_called_once_with([first])
+
+    assert await scheduler.run_due(now=at(20)) is None
+    publish.assert_called_with([second, third])
+
+
+@pytest.mark.asyncio
+async def test_announce_once(scheduler, publish):
+    talk = TalkFactory.build(start=at(5))
+    schedule = Schedule([talk])
+
+    scheduler.sync(schedule, now=NOW)
+    await scheduler.run_due(now=NOW)
+    scheduler.sync(schedule, now=NOW)
+    await scheduler.run_due(now=NOW)
+    await scheduler.announce([talk])
+
+    publish.assert_called_once_with([talk])
+
+
+@pytest.mark.asyncio
+async def test_resync_moves_talk(scheduler, publish):
+    talk = TalkFactory.build(start=at(30))
+    scheduler.sync(Schedule([talk]), now=NOW)
+
+    moved = TalkFactory.build(start=at(60), pretalx=talk.pretalx)
+    scheduler.sync(Schedule([moved]), now=NOW)
+
+    assert await scheduler.run_due(now=at(25)) == 25 * 60
+    publish.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_announce_publish_error(scheduler, publish):
+    publish.side_effect = Exception("discord is down")
+    await scheduler.announce([TalkFactory.build()])
+    publish.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_retry_undelivered(scheduler, publish):
+    delivered = TalkFactory.build(start=at(5))
+    failed = TalkFactory.build(start=at(5))
+    publish.side_effect = lambda talks, **kwargs: [delivered]
+    scheduler.sync(Schedule([delivered, failed]), now=NOW)
+
+    assert await scheduler.run_due(now=NOW) == RETRY_DELAY.total_seconds()
+
+    publish.side_effect = lambda talks, **kwargs: talks
+    await scheduler.run_due(now=NOW + RETRY_DELAY)
+    publish.assert_called_with([failed])
+    assert not scheduler
+
+
+@pytest.mark.asyncio
+async def test_no_retry_after_start(scheduler, publish):
+    publish.side_effect = Exception("discord is down")
+    await scheduler.announce([TalkFactory.build(start=at(-1))], now=NOW)
+    assert not scheduler
+
+
+@pytest.mark.asyncio
+async def test_announced_survive_restart(tmp_path, publish):
+    talk = TalkFactory.build(start=at(5))
+    state_path = tmp_path / "announced.json"
+    scheduler = AnnouncementScheduler(
+        publish, timedelta(minutes=10), state_path=state_path
+    )
+    await scheduler.announce([talk], now=NOW)
+
+    restarted = AnnouncementScheduler(
+        publish, timedelta(minutes=10), state_path=state_path
+    )
+    restarted.sync(Schedule([talk]), now=NOW)
+    await restarted.run_due(now=NOW)
+
+    publish.assert_called_once_with([talk])
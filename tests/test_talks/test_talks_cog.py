@@ -0,0 +1,87 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from pybr2022.talks.cog import TalksCog
+from pybr2022.talks.pretalx import Pretalx
+from tests.test_talks.factories import TalkFactory
+
+
+@pytest.fixture
+@patch("pybr2022.talks.cog.TalksCog._start_tasks", Mock())
+def talks_cog():
+    guild = AsyncMock()
+    guild.fetch_channel.side_effect = lambda room_id: AsyncMock(id=room_id)
+    return TalksCog(AsyncMock(), guild, Pretalx("event-slug", "api-token"))
+
+
+@pytest.mark.asyncio
+async def test_get_room_channel_cache(talks_cog):
+    channel = await talks_cog._get_room_channel(101)
+    assert await talks_cog._get_room_channel(101) is channel
+    talks_cog._guild.fetch_channel.assert_called_once_with(101)
+
+
+@pytest.mark.asyncio
+async def test_room_channel_invalidation(talks_cog):
+    channel = await talks_cog._get_room_channel(101)
+
+    updated = Mock(id=101)
+    await talks_cog.on_guild_channel_update(channel, updated)
+    assert await talks_cog._get_room_channel(101) is updated
+
+    await talks_cog.on_guild_channel_delete(updated)
+    assert await talks_cog._get_room_channel(101) is not updated
+
+
+@pytest.mark.asyncio
+async def test_publish_talks_in_channels_concurrently(talks_cog):
+    sending = []
+    release = asyncio.Event()
+
+    async def send(*args, **kwargs):
+        sending.append(args)
+        await release.wait()
+
+    channels = {room_id: AsyncMock(send=send) for room_id in (100, 101, 103)}
+    talks_cog._room_channels.update(channels)
+    talks = [
+        TalkFactory.build(room="Aruanã"),
+        TalkFactory.build(room="Jaraqui"),
+        TalkFactory.build(title="Keynote"),
+        TalkFactory.build(room="Unknown"),
+    ]
+
+    task = asyncio.create_task(talks_cog._publish_talks_in_channels(talks))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert len(sending) == 3
+
+    release.set()
+    assert await task == [talks[3], talks[0], talks[1], talks[2]]
+
+
+@pytest.mark.asyncio
+async def test_publish_talks_in_channels_skips_failed(talks_cog):
+    failing = AsyncMock(send=AsyncMock(side_effect=Exception("discord is down")))
+    talks_cog._room_channels.update({100: AsyncMock(), 101: failing})
+    talks = [TalkFactory.build(room="Aruanã"), TalkFactory.build(title="Keynote")]
+
+    assert await talks_cog._publish_talks_in_channels(talks) == [talks[1]]
+
+
+@pytest.mark.asyncio
+async def test_talks_preview_in_test_channel(talks_cog):
+    talks = [TalkFactory.build(room="Aruanã"), TalkFactory.build(room="Unknown")]
+    talks_cog._get_schedule = AsyncMock(
+        return_value=Mock(upcoming=Mock(return_value=talks))
+    )
+    talks_cog.scheduler = Mock(announce=AsyncMock())
+    context = AsyncMock()
+
+    await talks_cog.talks.callback(talks_cog, context, "preview")
+
+    assert context.message.channel.send.call_count == 2
+    talks_cog.scheduler.announce.assert_not_called()
+    talks_cog._guild.fetch_channel.assert_not_called()
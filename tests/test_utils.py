@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from pybr2022.utils import TemplateRegistry, render_template, templates
+
+
+@pytest.fixture
+def registry(tmp_path):
+    (tmp_path / "app" / "templates").mkdir(parents=True)
+    (tmp_path / "app" / "templates" / "hello.md").write_text("Olá {name}!")
+    return TemplateRegistry(tmp_path)
+
+
+def test_package_templates():
+    for name in (
+        "auth/auth_failed",
+        "auth/authenticated",
+        "auth/email_missing",
+        "auth/log_user_not_found",
+        "auth/user_already_authenticated",
+        "auth/user_not_in_server",
+        "messages/welcome",
+        "talks/next_talk",
+        "talks/next_talk_keynote",
+    ):
+        assert name in templates
+
+
+def test_render_template():
+    assert "<@42>" in render_template("auth/email_missing", user_id=42)
+
+
+def test_render(registry):
+    assert registry.render("app/hello", name="Python") == "Olá Python!"
+
+
+def test_render_missing_variable(registry):
+    with pytest.raises(KeyError):
+        registry.render("app/hello")
+
+
+def test_unnamed_placeholder(tmp_path):
+    (tmp_path / "app" / "templates").mkdir(parents=True)
+    (tmp_path / "app" / "templates" / "bad.md").write_text("Olá {}!")
+    with pytest.raises(ValueError):
+        TemplateRegistry(tmp_path)
+
+
+def test_hot_reload(registry):
+    path = registry.root / "app" / "templates" / "hello.md"
+    path.write_text("Oi {name}!")
+    os.utime(path, (0, 0))
+    assert registry.render("app/hello", name="Python") == "Olá Python!"
+
+    registry.hot_reload = True
+    assert registry.render("app/hello", name="Python") == "Oi Python!"